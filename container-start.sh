@@ -1,3 +1,7 @@
 #!/bin/bash
-gunicorn --bind 0.0.0.0:10000 -k uvicorn.workers.UvicornWorker curl_bible.server:app --timeout 90
+# Every worker writes its metrics here, /metrics adds them up
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/curl_bible_metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+gunicorn --config python:curl_bible.gunicorn_conf --bind 0.0.0.0:10000 -k uvicorn.workers.UvicornWorker curl_bible.server:app --timeout 90
 #--log-level info --error-logfile error.log --capture-output --log-config logging.conf
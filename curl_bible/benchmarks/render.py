@@ -0,0 +1,224 @@
+"""
+Microbenchmark rendering: joining the verses into the text of a passage
+(format_verses, the end of async_multi_query) and drawing the book (create_book),
+over a sweep of widths, lengths, colors, verse numbers and passage sizes:
+
+    python -m curl_bible.benchmarks.render --output render.json
+    python -m curl_bible.benchmarks.render --baseline curl_bible/benchmarks/render_baseline.json
+
+Every case reports the time of one render (the best of --repeat rounds of
+at least --round-ms) and the memory it allocates (the peak traced by
+tracemalloc). The wrapped text cache is cleared before every render, so the
+text is wrapped each time as for the first request of a passage. With
+--baseline, the run fails when a case is more than --threshold slower or
+allocates more than --threshold more than in the baseline.
+"""
+
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from collections import namedtuple
+from random import Random
+from time import perf_counter_ns
+
+from curl_bible.benchmarks.routes import FIXTURE_WORDS
+
+Verse = namedtuple("Verse", ["book", "chapter", "verse", "text"])
+
+# Name -> number of verses of each passage
+PASSAGES = {"verse": 1, "passage": 10, "chapter": 36, "psalm_119": 176}
+# Options must be within MIN_SIZE and MAX_SIZE (exclusive)
+WIDTHS = [6, 20, 40, 80, 160, 299]
+LENGTHS = [6, 20, 60, 120]
+
+COMPARED_METRICS = ("ns", "alloc_bytes")
+
+
+def passage_verses(verses: int, seed: int = 0) -> list:
+    """
+    Generate 'verses' verses of 8 to 40 words.
+    """
+    random = Random(seed)
+    return [
+        Verse(
+            19,
+            119,
+            verse,
+            " ".join(
+                random.choices(FIXTURE_WORDS, k=random.randint(8, 40))
+            ).capitalize()
+            + ".",
+        )
+        for verse in range(1, verses + 1)
+    ]
+
+
+def render_cases(widths: list, lengths: list, passages: dict):
+    """
+    Yield (name, render) for every case, 'render' doing a single render.
+    """
+    from curl_bible.config import Options, create_book, format_verses
+
+    for passage, verses in passages.items():
+        data = passage_verses(verses)
+        for numbers in (False, True):
+            options = Options(verse_numbers=numbers)
+            suffix = f"{passage}/{'numbers' if numbers else 'plain'}"
+            yield f"format/{suffix}", lambda data=data, options=options: format_verses(
+                data, options, {}
+            )
+
+            text = format_verses(data, options, {})["text"]
+            for width in widths:
+                for length in lengths:
+                    for color in (False, True):
+                        options = Options(
+                            width=width,
+                            length=length,
+                            color_text=color,
+                            verse_numbers=numbers,
+                        )
+                        name = f"book/w{width}/l{length}/{'color' if color else 'plain'}/{suffix}"
+                        yield name, lambda text=text, options=options: create_book(
+                            text, options, "Psalms 119:1-176"
+                        )
+
+
+def time_renders(render, number: int) -> int:
+    """
+    Return the nanoseconds taken by 'number' renders, each with the wrapped
+    text cache cleared.
+    """
+    from curl_bible.config import wrapped_text
+
+    elapsed = 0
+    for _ in range(number):
+        wrapped_text.cache_clear()
+        start = perf_counter_ns()
+        render()
+        elapsed += perf_counter_ns() - start
+    return elapsed
+
+
+def time_render(render, round_ns: int, repeat: int) -> int:
+    """
+    Return the nanoseconds of one render: the best of 'repeat' rounds, each
+    rendering as many times as fit in 'round_ns' (like timeit's autorange).
+    """
+    number = 1
+    while time_renders(render, number) < round_ns and number < 1_000_000:
+        number *= 2
+    return min(time_renders(render, number) for _ in range(repeat)) // number
+
+
+def allocated_bytes(render) -> int:
+    """
+    Return the peak memory allocated while rendering once.
+    """
+    from curl_bible.config import wrapped_text
+
+    wrapped_text.cache_clear()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        render()
+        return tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(cases, round_ns: int, repeat: int) -> dict:
+    """
+    Returns:
+        (dict): case name -> {"ns": time of a render, "alloc_bytes": memory allocated}.
+    """
+    results = {}
+    for name, render in cases:
+        # Warm up the templates and the wrapper of this width
+        render()
+        results[name] = {
+            "ns": time_render(render, round_ns, repeat),
+            "alloc_bytes": allocated_bytes(render),
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare the results with the baseline run.
+    Returns:
+        (list): A description of every case whose time or allocated memory
+            is more than 'threshold' (0.25 is 25%) higher than in the baseline.
+    """
+    regressions = []
+    for name, summary in results["cases"].items():
+        expected = baseline["cases"].get(name)
+        if expected is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if summary[metric] > expected[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {summary[metric]} against "
+                    f"{expected[metric]} in the baseline"
+                )
+    return regressions
+
+
+def main(args=None) -> None:
+    parser = ArgumentParser(description="Microbenchmark rendering the verses.")
+    parser.add_argument("--widths", default=",".join(map(str, WIDTHS)))
+    parser.add_argument("--lengths", default=",".join(map(str, LENGTHS)))
+    parser.add_argument(
+        "--passages", default=",".join(PASSAGES), help="comma separated passages"
+    )
+    parser.add_argument(
+        "--round-ms", type=float, default=5, help="shortest round of renders"
+    )
+    parser.add_argument("--repeat", type=int, default=7, help="rounds per case")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="fail when 25%% (0.25) worse than the baseline",
+    )
+    args = parser.parse_args(args)
+
+    # Nothing is queried, this only avoids needing the MariaDB driver
+    os.environ.setdefault("DB_BACKEND", "sqlite")
+    from curl_bible.config import __version__
+
+    cases = render_cases(
+        [int(width) for width in args.widths.split(",")],
+        [int(length) for length in args.lengths.split(",")],
+        {passage: PASSAGES[passage] for passage in args.passages.split(",")},
+    )
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "cases": run_benchmark(cases, int(args.round_ms * 1e6), args.repeat),
+    }
+    for name, summary in results["cases"].items():
+        print(f"{name:<45} {summary['ns']:>10} ns {summary['alloc_bytes']:>9} B")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
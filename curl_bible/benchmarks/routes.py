@@ -0,0 +1,356 @@
+"""
+Benchmark the verse routes offline, against a generated fixture Bible served
+from SQLite (or from the in-memory corpus with --source corpus):
+
+    python -m curl_bible.benchmarks.routes --output routes.json
+    python -m curl_bible.benchmarks.routes --baseline curl_bible/benchmarks/routes_baseline.json
+
+Every route is requested by 'concurrency' clients at once for each level of
+--concurrency, through the ASGI app itself (no sockets), and its throughput
+and p50/p95/p99 latency are reported. With --baseline, the run fails when the
+p95 latency or the throughput of a route is more than --threshold worse than
+in the baseline. Run it from the root of the repository.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+from argparse import ArgumentParser
+from math import ceil
+from random import Random
+from time import perf_counter
+
+# Name -> path of every route shape benchmarked
+ROUTES = {
+    "colon_single_verse": "/John:3:16",
+    "entire_chapter": "/John/3",
+    "slash_multi_verse": "/John/3/10-15",
+    "query_multi_verse": "/?book=John&chapter=3&verse=10-15",
+    "return_json": "/John:3:10-15?return_json=true",
+    "text_only": "/John:3:10-15?text_only=true",
+}
+
+# (book, names (the first is the primary one), chapters, verses per chapter)
+FIXTURE_BOOKS = [
+    (1, ["Genesis", "Gen"], 50, 30),
+    (19, ["Psalms", "Ps"], 150, 20),
+    (43, ["John", "Jn"], 21, 40),
+]
+FIXTURE_VERSIONS = ["ASV", "BBE", "KJV", "WEB", "YLT"]
+FIXTURE_WORDS = (
+    "and the of that he to in unto his lord shall for they be is him not them "
+    "with all thou thy which god said was my me will have ye people land day"
+).split()
+
+COMPARED_METRICS = ("p95_ms", "throughput")
+
+
+def fixture_rows(seed: int = 0) -> tuple:
+    """
+    Generate a small Bible: every FIXTURE_BOOKS chapter in every version,
+    with 8 to 40 words per verse.
+    Returns:
+        (tuple): version name -> (book, chapter, verse, text) rows, and the
+            (name, book, primary) book names.
+    """
+    random = Random(seed)
+    translations = {}
+    for version in FIXTURE_VERSIONS:
+        rows = translations[version] = []
+        for book, _, chapters, verses in FIXTURE_BOOKS:
+            for chapter in range(1, chapters + 1):
+                for verse in range(1, verses + 1):
+                    words = random.choices(FIXTURE_WORDS, k=random.randint(8, 40))
+                    text = " ".join(words).capitalize() + "."
+                    rows.append((book, chapter, verse, text))
+    abbreviations = [
+        (name, book, index == 0)
+        for book, names, _, _ in FIXTURE_BOOKS
+        for index, name in enumerate(names)
+    ]
+    return translations, abbreviations
+
+
+def fixture_dump(translations: dict, abbreviations: list) -> str:
+    """
+    Write the rows as the MySQL dump curl_bible.sqlite_loader reads.
+    """
+
+    def values(row) -> str:
+        return (
+            "("
+            + ",".join(
+                (
+                    "'" + value.replace("'", "''") + "'"
+                    if isinstance(value, str)
+                    else str(int(value))
+                )
+                for value in row
+            )
+            + ")"
+        )
+
+    lines = []
+    for version, rows in translations.items():
+        lines.append(
+            f"INSERT INTO `t_{version.lower()}` VALUES "
+            + ",".join(
+                values(
+                    (
+                        book * 1_000_000 + chapter * 1000 + verse,
+                        book,
+                        chapter,
+                        verse,
+                        text,
+                    )
+                )
+                for book, chapter, verse, text in rows
+            )
+            + ";"
+        )
+    lines.append(
+        "INSERT INTO `key_abbreviations_english` VALUES "
+        + ",".join(
+            values((index, name, book, primary))
+            for index, (name, book, primary) in enumerate(abbreviations, 1)
+        )
+        + ";"
+    )
+    return "\n".join(lines)
+
+
+def build_fixture(directory: str, source: str) -> dict:
+    """
+    Build the fixture SQLite database (and corpus file for the 'corpus'
+    source) in 'directory'.
+    Returns:
+        (dict): The environment variables pointing the server at them.
+    """
+    from curl_bible.build_corpus import build_corpus
+    from curl_bible.sqlite_loader import build_sqlite
+
+    translations, abbreviations = fixture_rows()
+    dump_path = os.path.join(directory, "fixture.sql")
+    with open(dump_path, "w", encoding="utf-8") as f:
+        f.write(fixture_dump(translations, abbreviations))
+    sqlite_path = os.path.join(directory, "fixture.sqlite3")
+    build_sqlite(dump_path, sqlite_path)
+
+    environment = {"SQLITE_PATH": sqlite_path, "CORPUS_PATH": ""}
+    if source == "corpus":
+        environment["CORPUS_PATH"] = os.path.join(directory, "fixture.bin")
+        build_corpus(translations, abbreviations, environment["CORPUS_PATH"])
+    return environment
+
+
+def configure_environment(environment: dict, cache: bool) -> None:
+    """
+    Point the settings at the fixture and turn off everything that would
+    reach outside the process. Must run before the server is imported.
+    """
+    os.environ.update(environment)
+    os.environ.update(
+        {
+            "DB_BACKEND": "sqlite",
+            "RATE_LIMIT": "1000000/second",
+            "RATE_LIMIT_STORAGE_URI": "memory://",
+            "INFLUXDB_URL": "",
+            "SEARCH_ENABLED": "False",
+            # Repeating the same requests would otherwise only measure the cache
+            "RESPONSE_CACHE_MAX_ENTRIES": "4096" if cache else "0",
+        }
+    )
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+
+def percentile(latencies: list, fraction: float) -> float:
+    """
+    Nearest rank percentile of sorted 'latencies'.
+    """
+    # Rounded first so 0.07 * 100 (7.000000000000001) is rank 7
+    rank = ceil(round(fraction * len(latencies), 9))
+    return latencies[min(max(rank, 1), len(latencies)) - 1]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """
+    Summarize the latencies (in seconds) of requests sent over 'elapsed' seconds.
+    """
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def measure(client, path: str, requests: int, concurrency: int) -> dict:
+    """
+    Send 'requests' requests for 'path', 'concurrency' at a time.
+    """
+    remaining = iter(range(requests))
+    latencies = []
+
+    async def worker() -> None:
+        for _ in remaining:
+            start = perf_counter()
+            response = await client.get(path)
+            latencies.append(perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, perf_counter() - start)
+
+
+async def run_benchmark(
+    routes: dict, concurrency_levels: list, requests: int, warmup: int
+) -> dict:
+    """
+    Returns:
+        (dict): route name -> concurrency -> summary (see summarize).
+    """
+    import httpx
+
+    from curl_bible.server import app
+
+    # Only warnings, a log line per request would be most of what is measured
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        for _ in range(300):
+            if app.state.database_ready:
+                break
+            await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError("The fixture database never became ready")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            for name, path in routes.items():
+                await measure(client, path, warmup, 1)
+                results[name] = {
+                    str(concurrency): await measure(client, path, requests, concurrency)
+                    for concurrency in concurrency_levels
+                }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare the results with the baseline run.
+    Returns:
+        (list): A description of every route and concurrency whose p95
+            latency or throughput is more than 'threshold' (0.25 is 25%)
+            worse than in the baseline.
+    """
+    regressions = []
+    for name, levels in results["routes"].items():
+        for concurrency, summary in levels.items():
+            expected = baseline["routes"].get(name, {}).get(concurrency)
+            if expected is None:
+                continue
+            for metric in COMPARED_METRICS:
+                value, reference = summary[metric], expected[metric]
+                if metric == "throughput":
+                    worse = value < reference * (1 - threshold)
+                else:
+                    worse = value > reference * (1 + threshold)
+                if worse:
+                    regressions.append(
+                        f"{name} (concurrency {concurrency}): {metric} {value} "
+                        f"against {reference} in the baseline"
+                    )
+    return regressions
+
+
+def format_table(routes: dict) -> str:
+    lines = [
+        f"{'route':<20} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    ]
+    for name, levels in routes.items():
+        for concurrency, summary in levels.items():
+            lines.append(
+                f"{name:<20} {concurrency:>7} {summary['throughput']:>9} "
+                f"{summary['p50_ms']:>9} {summary['p95_ms']:>9} {summary['p99_ms']:>9}"
+            )
+    return "\n".join(lines)
+
+
+def main(args=None) -> None:
+    parser = ArgumentParser(description="Benchmark the verse routes offline.")
+    parser.add_argument("--source", choices=["sqlite", "corpus"], default="sqlite")
+    parser.add_argument(
+        "--concurrency", default="1,8,32", help="comma separated client counts"
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument(
+        "--cache", action="store_true", help="keep the rendered response cache on"
+    )
+    parser.add_argument("--routes", help="comma separated route names (all by default)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="fail when 25%% (0.25) worse than the baseline",
+    )
+    args = parser.parse_args(args)
+
+    routes = ROUTES
+    if args.routes:
+        routes = {name: ROUTES[name] for name in args.routes.split(",")}
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(build_fixture(directory, args.source), args.cache)
+        routes_results = asyncio.run(
+            run_benchmark(routes, concurrency_levels, args.requests, args.warmup)
+        )
+
+    from curl_bible.config import __version__
+
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "source": args.source,
+        "cache": args.cache,
+        "requests": args.requests,
+        "routes": routes_results,
+    }
+    print(format_table(routes_results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline["source"], baseline["cache"]) != (args.source, args.cache):
+            sys.exit(
+                f"The baseline was run with --source {baseline['source']}"
+                + (" --cache" if baseline["cache"] else "")
+            )
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
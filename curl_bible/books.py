@@ -0,0 +1,154 @@
+from sqlalchemy import func, select
+
+import curl_bible.db_models as schemas
+
+
+class BookIndex:
+    """
+    Case-insensitive lookup of every name in 'key_abbreviations_english'
+    ('John', 'Jn', 'Rev', ...) to its book id and primary name.
+
+    The table is loaded once (at startup, or on first use) instead of being
+    queried on every request. Call refresh/async_refresh if the table changes.
+    """
+
+    def __init__(self) -> None:
+        # lowercase name -> (book id, primary name)
+        self.names = {}
+        # book id -> primary name
+        self.primary_names = {}
+
+    @property
+    def loaded(self) -> bool:
+        return len(self.names) > 0
+
+    def build(self, rows) -> None:
+        """
+        Build the index from (name, book, primary) rows in table order.
+        A name that is the primary name of a book wins over an abbreviation,
+        and the last primary name of a book is used as its full name.
+        """
+        primary_names = {}
+        book_ids = {}
+        for name, book, primary in rows:
+            key = name.lower()
+            if primary:
+                primary_names[book] = name
+                if not book_ids.get(key, (None, False))[1]:
+                    book_ids[key] = (book, True)
+            elif key not in book_ids:
+                book_ids[key] = (book, False)
+
+        self.names = {
+            key: (book, primary_names.get(book, key.title()))
+            for key, (book, _) in book_ids.items()
+        }
+        self.primary_names = primary_names
+
+    def statement(self):
+        book_list = schemas.KeyAbbreviationsEnglish
+        return select(book_list.name, book_list.book, book_list.primary).order_by(
+            book_list.id
+        )
+
+    def refresh(self, db) -> None:
+        self.build(db.execute(self.statement()).all())
+
+    async def async_refresh(self, db) -> None:
+        self.build((await db.execute(self.statement())).all())
+
+    def resolve(self, name: str) -> tuple:
+        """
+        Return the (book id, primary name) of a book name or abbreviation.
+        Raises:
+            KeyError: the name is not a known book.
+        """
+        return self.names[str(name).lower()]
+
+    def primary_name(self, book: int) -> str:
+        """
+        Return the full name of a book id, e.g. 'John' for 43.
+        """
+        return self.primary_names.get(book, str(book))
+
+
+book_index = BookIndex()
+
+
+class VerseBounds:
+    """
+    The last verse of every chapter of each translation, to tell a chapter or
+    verse that doesn't exist from a reference that merely returns no text.
+
+    Loaded once, from the "bounds" of the corpus file (see build_corpus) or
+    from the DB at startup. Call refresh/async_refresh if the tables change.
+    """
+
+    def __init__(self) -> None:
+        # version -> {(book, chapter): last verse}
+        self.last_verses = {}
+
+    @property
+    def loaded(self) -> bool:
+        return len(self.last_verses) > 0
+
+    def has_translation(self, version: str) -> bool:
+        return version in self.last_verses
+
+    def build(self, version: str, rows) -> None:
+        """
+        Add the bounds of a translation from (book, chapter, last verse) rows.
+        """
+        self.last_verses[version] = {
+            (int(book), int(chapter)): int(verse) for book, chapter, verse in rows
+        }
+
+    def build_metadata(self, bounds: dict) -> None:
+        """
+        Add the bounds stored in a corpus file, {version: {book: {chapter: verse}}}.
+        """
+        for version, books in bounds.items():
+            self.build(
+                version,
+                (
+                    (book, chapter, verse)
+                    for book, chapters in books.items()
+                    for chapter, verse in chapters.items()
+                ),
+            )
+
+    def statement(self, table):
+        return select(table.book, table.chapter, func.max(table.verse)).group_by(
+            table.book, table.chapter
+        )
+
+    def refresh(self, db, tables: dict) -> None:
+        for version, table in tables.items():
+            self.build(version, db.execute(self.statement(table)).all())
+
+    async def async_refresh(self, db, tables: dict) -> None:
+        for version, table in tables.items():
+            self.build(version, (await db.execute(self.statement(table))).all())
+
+    def last_verse(self, version: str, book: int, chapter: int) -> int | None:
+        """
+        Return the last verse of a chapter, or None if the chapter doesn't exist.
+        Raises:
+            KeyError: the bounds of the version aren't loaded.
+        """
+        return self.last_verses[version].get((book, chapter))
+
+    def clear(self) -> None:
+        self.last_verses = {}
+
+
+verse_bounds = VerseBounds()
+
+
+async def async_resolve_book(db, name: str) -> tuple:
+    """
+    Resolve a book name, loading the index from the DB the first time.
+    """
+    if not book_index.loaded:
+        await book_index.async_refresh(db)
+    return book_index.resolve(name)
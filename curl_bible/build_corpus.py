@@ -0,0 +1,119 @@
+"""
+Compile the corpus file served with CORPUS_PATH, from the MySQL dump or a
+running database:
+
+    python -m curl_bible.build_corpus --dump bible_db/bible-sql.sql
+    python -m curl_bible.build_corpus --database --output bible_db/corpus.bin
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from curl_bible.corpus import VerseCorpus, write_corpus_file
+from curl_bible.sqlite_loader import TABLES, iter_dump_rows
+
+
+def rows_from_dump(dump_path: str) -> tuple:
+    """
+    Read every translation and the book names out of the MySQL dump.
+    Returns:
+        (tuple): version name -> (book, chapter, verse, text) rows, and the
+            (name, book, primary) rows of 'key_abbreviations_english'.
+    """
+    with open(dump_path, "r", encoding="utf-8") as f:
+        dump = f.read()
+
+    translations = {}
+    abbreviations = []
+    for table, row in iter_dump_rows(dump, TABLES):
+        if table == "key_abbreviations_english":
+            _, name, book, primary = row
+            abbreviations.append((name, book, bool(primary)))
+        else:
+            _, book, chapter, verse, text = row
+            version = table.removeprefix("t_").upper()
+            translations.setdefault(version, []).append((book, chapter, verse, text))
+    return translations, abbreviations
+
+
+def rows_from_database() -> tuple:
+    """
+    Same as rows_from_dump, but read from the database set up in .env.
+    """
+    from curl_bible.books import book_index
+    from curl_bible.database import SessionLocal
+    from curl_bible.db_models import TRANSLATION_TABLES
+
+    with SessionLocal() as db:
+        translations = {
+            version: db.query(table.book, table.chapter, table.verse, table.text)
+            .order_by(table.id)
+            .all()
+            for version, table in TRANSLATION_TABLES.items()
+        }
+        abbreviations = db.execute(book_index.statement()).all()
+    return translations, [tuple(row) for row in abbreviations]
+
+
+def chapter_bounds(rows) -> dict:
+    """
+    Return the last verse of every chapter, as {book: {chapter: verse}}.
+    """
+    bounds = {}
+    for book, chapter, verse, _ in rows:
+        chapters = bounds.setdefault(str(book), {})
+        chapters[str(chapter)] = max(verse, chapters.get(str(chapter), 0))
+    return bounds
+
+
+def build_corpus(translations: dict, abbreviations: list, output: str) -> dict:
+    """
+    Write the corpus file, adding the bounds of every translation and the
+    book names (so the server doesn't need the database to resolve them).
+    Returns:
+        (dict): The metadata of the file.
+    """
+    if not translations or not all(translations.values()):
+        raise ValueError("No verses found, is the dump downloaded (git lfs pull)?")
+    return write_corpus_file(
+        output,
+        translations,
+        {
+            "bounds": {
+                version: chapter_bounds(rows) for version, rows in translations.items()
+            },
+            "abbreviations": abbreviations,
+        },
+    )
+
+
+def main(args=None) -> None:
+    parser = ArgumentParser(description="Compile the verse corpus file.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--dump", default="bible_db/bible-sql.sql")
+    source.add_argument("--database", action="store_true")
+    parser.add_argument("--output", default="bible_db/corpus.bin")
+    args = parser.parse_args(args)
+
+    if args.database:
+        translations, abbreviations = rows_from_database()
+    else:
+        translations, abbreviations = rows_from_dump(args.dump)
+    metadata = build_corpus(translations, abbreviations, args.output)
+
+    start = perf_counter()
+    corpus = VerseCorpus()
+    corpus.map_file(args.output, verify=True)
+    elapsed = (perf_counter() - start) * 1000
+
+    for version, sections in metadata["translations"].items():
+        print(f"{version}: {sections['rows']} verses")
+    print(f"{len(abbreviations)} book names")
+    print(
+        f"Wrote {args.output} ({corpus.nbytes()} bytes, sha256 {metadata['checksum']})"
+    )
+    print(f"Mapped and verified in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
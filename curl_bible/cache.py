@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache for rendered responses.
+
+    Bible text never changes, so a response only depends on the reference and
+    the options used to render it. Entries are evicted (least recently used
+    first) once either 'max_entries' or 'max_bytes' would be exceeded.
+    Setting either limit to 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Return the cached value for 'key', or None if it isn't cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, size: int) -> None:
+        """
+        Cache 'value' (which takes up 'size' bytes) under 'key'.
+        Values larger than the whole cache are not stored.
+        """
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag of a response that only depends on 'parts' (whose repr must
+    be the same in every worker and every run, unlike their hash).
+    """
+    digest = blake2b(repr(parts).encode("utf-8"), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header ('"a", W/"b"') matches 'etag', in which
+    case the client already has the response (weak comparison). '*' is not a
+    match: it is meant for conditional writes, and would answer 304 for
+    verses that don't exist.
+    """
+    if not if_none_match:
+        return False
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag.removeprefix("W/") for tag in tags)
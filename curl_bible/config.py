@@ -1,14 +1,25 @@
-from copy import deepcopy
+import re
+from bisect import bisect_left, bisect_right
 from functools import lru_cache
 from logging import INFO, basicConfig
 from math import ceil
-from textwrap import TextWrapper
+from textwrap import TextWrapper, shorten
+from threading import Lock
+from typing import NamedTuple
+from urllib.parse import parse_qsl
 
 from fastapi import HTTPException, Request, status
-from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
+from sqlalchemy import literal, or_, select, union_all
 
 import curl_bible.db_models as schemas
+from curl_bible.books import (
+    async_resolve_book,
+    book_index,
+    verse_bounds,
+)
+from curl_bible.corpus import RANGE_KEYS, corpus, verse_id
 
 __version__ = "0.2.7"
 
@@ -16,16 +27,6 @@ __version__ = "0.2.7"
 class Settings(BaseSettings):
     # Matches '3','999','1-999','999-1'
     VERSE_REGEX: str = "^(([0-9]{1,3})|([0-9]{1,3}-[0-9]{1,3}))$"
-    # Matches 'John:3:5','Psalms:119:175'
-    SINGLE_SEMICOLON_REGEX: str = "^([A-z]*:[0-9]{1,3}:[0-9]{1,3})$"
-    # Matches 'John:3:5:John:4:3', 'Numbers:7:1:Psalms:119:175'
-    MULTI_SEMICOLON_REGEX: str = (
-        "^([A-z]*:[0-9]{1,3}:[0-9]{1,3}:[A-z]*:[0-9]{1,3}:[0-9]{1,3})$"
-    )
-    # Matches 'John:3:1-2','Psalms:119:170-176'
-    SINGLE_SEMICOLON_DASH_REGEX: str = "^([A-z]*:[0-9]{1,3}:[0-9]{1,3}-[0-9]{1,3})$"
-    # Matches 'John 3'
-    ENTIRE_CHAPTER_REGEX: str = "^([A-z]*:[0-9]{1,3})$"
     # Matches 'AAA', 'ZZZ'
     VERSION_REGEX: str = "^([A-Z]{3})$"
     REGULAR_TO_SUPERSCRIPT: dict = {
@@ -41,6 +42,11 @@ class Settings(BaseSettings):
         "9": "⁹",
     }
     RATE_LIMIT: str = "60/minute"
+    # "shm://<path>" shares the limits between the workers ("shm://" uses
+    # /dev/shm/curl_bible_rate_limit), "memory://" counts them per worker
+    RATE_LIMIT_STORAGE_URI: str = "shm://"
+    # Comma separated addresses and networks without a rate limit
+    RATE_LIMIT_EXEMPT: str = ""
     COLOR_TEXT_DEFAULT: bool = True
     TEXT_ONLY_DEFAULT: bool = False
     VERSION_DEFAULT: str = "ASV"
@@ -51,6 +57,29 @@ class Settings(BaseSettings):
     JSON_DEFAULT: bool = False
     OPTIONS_DEFAULT: str = ""
     VERSE_NUMBERS: bool = True
+    STREAM_DEFAULT: bool = False
+    # Serve verses from an in-memory copy of every translation instead of the DB
+    CORPUS_ENABLED: bool = False
+    # Memory map the corpus from this file (see write_corpus_file) instead
+    CORPUS_PATH: str = ""
+    # Limits of the rendered response cache (0 disables it)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 4096
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Seconds clients and CDNs may reuse a verse response (Cache-Control),
+    # revalidated with its ETag after that
+    HTTP_CACHE_MAX_AGE: int = 86400
+    # Most verses a single reference returns, larger ranges are refused
+    MAX_RANGE_VERSES: int = 1000
+    # Most references accepted by a single POST /batch request
+    BATCH_MAX_REFERENCES: int = 100
+    # Most verses fetched for a single POST /batch request, all references together
+    BATCH_MAX_VERSES: int = 5000
+    # Time each stage of a request, sent in the Server-Timing header and logs
+    SERVER_TIMING_ENABLED: bool = False
+    # Build the full text search index (/search) at startup
+    SEARCH_ENABLED: bool = True
+    SEARCH_RESULTS_DEFAULT: int = 10
+    SEARCH_RESULTS_MAX: int = 100
 
 
 class Book:
@@ -127,24 +156,262 @@ class Book:
         return self.book_color
 
 
+BOOK_PARTS = {True: Book().get_color(), False: Book().get_no_color()}
+
+
+class BookTemplate:
+    """
+    The static parts of a book of a given width, built once and reused for
+    every render: the top, the bottom and the pieces of each middle row.
+    Only the text in each row has to be filled in when rendering.
+    """
+
+    __slots__ = (
+        "page_width",
+        "top",
+        "bottom",
+        "row_start",
+        "row_middle",
+        "row_end",
+        "blank_page",
+        "empty_row",
+    )
+
+    def __init__(self, width: int, color_text: bool) -> None:
+        book_parts = BOOK_PARTS[color_text]
+        page_width = width // 2
+        self.page_width = page_width
+
+        # Generating the book in this way allows for the easy modification of
+        # book generation.
+        self.top = "".join(
+            [
+                "    ",
+                book_parts["top_level"] * page_width,
+                " ",
+                book_parts["top_level"] * page_width,
+                "    \n",
+                book_parts["top_start"],
+                " " * (page_width - 1),
+                book_parts["top_middle"],
+                " " * (page_width - 1),
+                book_parts["top_end"],
+            ]
+        )
+        final_bottom_single_pg = "".join(
+            [
+                book_parts["bottom_single_pg_start"],
+                book_parts["top_level"] * (page_width - 1),
+                book_parts["bottom_single_pg_middle"],
+                book_parts["top_level"] * (page_width - 1),
+                book_parts["bottom_single_pg_end"],
+                "\n",
+            ]
+        )
+        final_bottom_multi_pg = "".join(
+            [
+                book_parts["bottom_multi_pg_left"],
+                "=" * (page_width - 1),
+                book_parts["bottom_multi_pg_middle"],
+                "=" * (page_width - 1),
+                book_parts["bottom_multi_pg_end"],
+                "\n",
+            ]
+        )
+        final_bottom_final_pg = "".join(
+            [
+                book_parts["bottom_final_pg_left"],
+                "-" * (page_width - 2),
+                book_parts["bottom_final_pg_middle"],
+                "-" * (page_width - 2),
+                book_parts["bottom_final_pg_end"],
+                "\n",
+            ]
+        )
+        self.bottom = (
+            final_bottom_single_pg + final_bottom_multi_pg + final_bottom_final_pg
+        )
+
+        self.row_start = book_parts["middle_start"]
+        self.row_middle = book_parts["middle"]
+        self.row_end = book_parts["middle_end"] + "\n"
+        self.blank_page = " " * page_width
+        self.empty_row = self.row(None, None)
+
+    def page(self, text: str) -> str:
+        """
+        One line of a page, padded to the width of the page.
+        """
+        if text is None:
+            return self.blank_page
+        return f" {text}".ljust(self.page_width)
+
+    def row(self, left: str, right: str = None) -> str:
+        """
+        One row of the book, with 'left' and 'right' on each page.
+        """
+        return (
+            self.row_start
+            + self.page(left)
+            + self.row_middle
+            + self.page(right)
+            + self.row_end
+        )
+
+
+@lru_cache(maxsize=1024)
+def book_template(width: int, color_text: bool) -> BookTemplate:
+    return BookTemplate(width, color_text)
+
+
+@lru_cache(maxsize=1024)
+def text_wrapper(width: int) -> TextWrapper:
+    return TextWrapper(width=width)
+
+
+class WrappedText:
+    """
+    The lines of 'text' wrapped to 'width', only wrapped as far as they are
+    first needed. The offset of each line in the text is kept so any range of
+    lines can be sliced straight out of the text.
+    """
+
+    def __init__(self, text: str, width: int) -> None:
+        self.text = text
+        self.lines = []
+        self.offsets = []
+        self.wrapping = iter_wrap(text, width)
+        self.lock = Lock()
+
+    def has(self, index: int) -> bool:
+        """
+        Return whether the text has a line 'index', wrapping up to it if needed.
+        """
+        if index < len(self.lines):
+            return True
+        with self.lock:
+            while len(self.lines) <= index:
+                line = next(self.wrapping, None)
+                if line is None:
+                    return False
+                start = self.offsets[-1] + len(self.lines[-1]) if self.lines else 0
+                offset = self.text.find(line, start)
+                self.offsets.append(start if offset == -1 else offset)
+                self.lines.append(line)
+        return True
+
+    def __getitem__(self, index: int) -> str:
+        return self.lines[index]
+
+    def offset(self, index: int) -> int:
+        """
+        Return where line 'index' starts in the text (the end of the text if
+        there is no such line).
+        """
+        return self.offsets[index] if self.has(index) else len(self.text)
+
+
+@lru_cache(maxsize=256)
+def wrapped_text(text: str, width: int) -> WrappedText:
+    return WrappedText(text, width)
+
+
+class BookLines:
+    """
+    Every line shown in a book: the header followed by the wrapped text.
+    """
+
+    def __init__(self, header: list, wrapped: WrappedText) -> None:
+        self.header = header
+        self.wrapped = wrapped
+
+    def has(self, index: int) -> bool:
+        return index < len(self.header) or self.wrapped.has(index - len(self.header))
+
+    def __getitem__(self, index: int) -> str:
+        if index < len(self.header):
+            return self.header[index]
+        return self.wrapped[index - len(self.header)]
+
+    def offset(self, index: int) -> int:
+        return self.wrapped.offset(max(index - len(self.header), 0))
+
+
+def iter_wrap(text: str, width: int, chunk_size: int = 2048):
+    """
+    Lazily yield the same lines as TextWrapper(width).wrap(text).
+
+    The text is wrapped a chunk at a time. The last (possibly unfinished) line
+    of each chunk is carried over and wrapped again with the next chunk, which
+    gives the same result as wrapping the whole text since a line only depends
+    on the text from its own start. Chunks are only split on single spaces so
+    no whitespace is lost.
+    """
+    wrapper = text_wrapper(width)
+    # Tabs expand differently depending on where the chunk starts, and the
+    # other whitespace (newlines...) turns into spaces next to the ones the
+    # chunks are split on
+    if any(character in text for character in "\t\n\r\x0b\x0c"):
+        yield from wrapper.wrap(text)
+        return
+    start = 0
+    carried = ""
+    while start < len(text):
+        end = text.find(" ", start + chunk_size)
+        while end != -1 and (text[end - 1] == " " or text.startswith(" ", end + 1)):
+            end = text.find(" ", end + 1)
+        if end == -1:
+            end = len(text)
+
+        chunk = text[start:end]
+        lines = wrapper.wrap(f"{carried} {chunk}" if carried else chunk)
+        if end == len(text):
+            yield from lines
+            return
+        yield from lines[:-1]
+        carried = lines[-1] if lines else ""
+        start = end + 1
+    if carried:
+        yield carried
+
+
+@lru_cache()
+def configure_logging():
+    basicConfig(level=INFO, filename="config.log")
+
+
 @lru_cache()
 def create_settings():
     return Settings()
 
 
-def create_request_verse(db, **kwargs) -> str:
-    book_list = schemas.KeyAbbreviationsEnglish
-    book_id = (
-        db.query(book_list).filter(book_list.name == kwargs.get("book")).first().book
-    )
-    full_book_name = (
-        db.query(book_list)
-        .filter(book_list.book == book_id)
-        .filter(book_list.primary == "1")
-        .all()[-1]
-        .name
-    )
-    kwargs["book"] = full_book_name
+# Arguments holding a book name (or id, once flattened)
+BOOK_KEYS = {"book", "book_end"}
+
+
+async def async_create_request_verse(db, **kwargs) -> str:
+    """
+    Format the reference of the arguments with the full names of its books
+    (see format_request_verse).
+    Raises:
+        UserError: a book is not found.
+    """
+    for key in sorted(BOOK_KEYS.intersection(kwargs)) or ["book"]:
+        try:
+            _, kwargs[key] = await async_resolve_book(db, kwargs.get(key))
+        except KeyError as e:
+            raise UserError(f"Book {kwargs.get(key)} not found.") from e
+    if kwargs.get("book_end") == kwargs.get("book"):
+        kwargs.pop("book_end", None)
+    return format_request_verse(**kwargs)
+
+
+def format_request_verse(**kwargs) -> str:
+    """
+    Format the verse shown at the top of the book, such as 'John 3:10-15'.
+    """
+    if set(kwargs.keys()) == RANGE_KEYS | {"book_end"}:
+        return f"{kwargs.get('book')} {kwargs.get('chapter_start')}:{kwargs.get('verse_start')} - {kwargs.get('book_end')} {kwargs.get('chapter_end')}:{kwargs.get('verse_end')}"
     if set(kwargs.keys()) == {
         "book",
         "chapter_start",
@@ -161,195 +428,320 @@ def create_request_verse(db, **kwargs) -> str:
         return f"{kwargs.get('book')} {kwargs.get('chapter')}:{kwargs.get('verse')}"
 
 
-def is_bool(bool_test: str) -> bool:
-    if isinstance(bool_test, bool):
-        return bool_test
-    return bool_test.lower() in ("yes", "true", "t", "1")
+# Every form of reference the routes accept, separated by ':' or '/':
+#   John:3, John:3:16, John:3:16-18, John/3/16/18, John:3:16-4:3 (across
+#   chapters) and Genesis:1:1:Exodus:2:3 (across books)
+REFERENCE_REGEX = re.compile(
+    r"""
+    (?P<book>[^:/]+) [:/] (?P<chapter>[^:/-]+)
+    (?:
+        [:/] (?P<verse>[^:/-]+)
+        (?:
+            - (?P<range_chapter>[^:/-]+) [:/] (?P<range_verse>[^:/-]+)
+          | [-/] (?P<verse_end>[^:/-]+)
+          | [:/] (?P<book_end>[^:/]+) [:/] (?P<end_chapter>[^:/-]+)
+            [:/] (?P<end_verse>[^:/-]+)
+        )?
+    )?
+    """,
+    re.VERBOSE,
+)
+
+
+class Reference(NamedTuple):
+    """
+    A parsed reference, the same for every form of the same passage
+    ('John:3:16-18', 'John/3/16/18', 'John/03/16-18'...). Only the fields
+    of its form are set (see arguments).
+    """
 
+    book: str
+    chapter: str | None = None
+    verse: str | None = None
+    chapter_start: str | None = None
+    verse_start: str | None = None
+    book_end: str | None = None
+    chapter_end: str | None = None
+    verse_end: str | None = None
 
-settings = create_settings()
+    def arguments(self) -> dict:
+        """
+        The query arguments (book, chapter, verse...) of the reference.
+        """
+        return {
+            name: value for name, value in zip(self._fields, self) if value is not None
+        }
 
 
-class OptionsNames:
-    short_to_long = {
-        "color": "color_text",
-        "text": "text_only",
-        "numbers": "verse_numbers",
-        "json": "return_json",
-        "c": "color_text",
-        "l": "length",
-        "t": "text_only",
-        "w": "width",
-        "v": "version",
-        "n": "verse_numbers",
-        "j": "return_json",
-    }
+def canonical_number(number: str) -> str:
+    # Invalid numbers are reported once the arguments are padded
+    return str(int(number)) if number.isdecimal() else number
+
 
-    values = {
-        "color_text": settings.COLOR_TEXT_DEFAULT,
-        "length": settings.LENGTH_DEFAULT,
-        "text_only": settings.TEXT_ONLY_DEFAULT,
-        "width": settings.WIDTH_DEFAULT,
-        "version": settings.VERSION_DEFAULT,
-        "verse_numbers": settings.VERSE_NUMBERS,
-        "return_json": settings.JSON_DEFAULT,
+@lru_cache(maxsize=4096)
+def parse_reference(reference: str) -> Reference | None:
+    """
+    Parse a reference written in any of the forms of REFERENCE_REGEX.
+    Returns:
+        (Reference): The reference, or None if it isn't understood.
+    """
+    match = REFERENCE_REGEX.fullmatch(reference.strip().strip("/"))
+    if match is None:
+        return None
+    parts = {
+        name: value if name in ("book", "book_end") else canonical_number(value)
+        for name, value in match.groupdict().items()
+        if value is not None
     }
+    book, chapter, verse = parts["book"].strip(), parts["chapter"], parts.get("verse")
+    if "book_end" in parts:
+        return Reference(
+            book,
+            chapter_start=chapter,
+            verse_start=verse,
+            book_end=parts["book_end"].strip(),
+            chapter_end=parts["end_chapter"],
+            verse_end=parts["end_verse"],
+        )
+    if "range_chapter" in parts:
+        return Reference(
+            book,
+            chapter_start=chapter,
+            verse_start=verse,
+            chapter_end=parts["range_chapter"],
+            verse_end=parts["range_verse"],
+        )
+    if "verse_end" in parts:
+        return Reference(book, chapter, verse_start=verse, verse_end=parts["verse_end"])
+    return Reference(book, chapter, verse)
 
-    def to_long(self, option):
+
+def query_reference(
+    book: str | None, chapter: int | None, verse: str | None
+) -> Reference:
+    """
+    Build the reference of the book, chapter and verse query parameters
+    ('?book=John&chapter=3&verse=16-18'), each field from its own parameter.
+    Raises:
+        UserError: the book or the chapter (of a verse) is missing.
+    """
+    if book is None:
+        raise UserError("A book is needed to find verses.")
+    if chapter is None:
+        if verse is not None:
+            raise UserError(f"Verse {verse} needs a chapter.")
+        raise UserError(f"Reference {book} not understood.")
+    book, chapter = book.strip(), str(chapter)
+    if verse is None:
+        return Reference(book, chapter)
+    verse_start, _, verse_end = verse.partition("-")
+    if verse_end:
+        return Reference(
+            book,
+            chapter,
+            verse_start=canonical_number(verse_start),
+            verse_end=canonical_number(verse_end),
+        )
+    return Reference(book, chapter, canonical_number(verse))
+
+
+settings = create_settings()
+
+
+class Options(NamedTuple):
+    """
+    The rendering options of a request. Immutable and hashable: parse_options
+    returns the same object for the same query string, and it can key caches.
+    """
+
+    color_text: bool = settings.COLOR_TEXT_DEFAULT
+    text_only: bool = settings.TEXT_ONLY_DEFAULT
+    version: str = settings.VERSION_DEFAULT
+    length: int = settings.LENGTH_DEFAULT
+    width: int = settings.WIDTH_DEFAULT
+    verse_numbers: bool = settings.VERSE_NUMBERS
+    return_json: bool = settings.JSON_DEFAULT
+    stream: bool = settings.STREAM_DEFAULT
+    page: int | None = None
+    versions: str | None = None
+
+    def to_json(self) -> dict:
         """
-        Return the full name of the option
+        The options as returned in JSON responses.
         """
-        if option in self.short_to_long:
-            return self.short_to_long[option]
+        content = {
+            JSON_NAMES.get(name, name): value for name, value in zip(self._fields, self)
+        }
+        # Kept for the clients of the JSON responses, which always had them.
+        # The raw 'options' parameter isn't kept: the same options passed
+        # either way are the same Options, sharing caches and ETags.
+        content["options"] = None
+        content["request"] = None
+        return content
+
+
+def parse_bool(value: str) -> bool | None:
+    value = value.lower()
+    if value in ("yes", "y", "true", "t", "on", "1"):
+        return True
+    if value in ("no", "n", "false", "f", "off", "0"):
+        return False
+    return None
+
+
+def parse_size(value: str) -> int | None:
+    if value.isdecimal() and settings.MIN_SIZE < int(value) < settings.MAX_SIZE:
+        return int(value)
+    return None
+
+
+def parse_page(value: str) -> int | None:
+    if value.isdecimal() and int(value) > 0:
+        return int(value)
+    return None
+
+
+def parse_version(value: str) -> str | None:
+    return value.upper() or None
+
+
+# Option -> (parser of its values, OpenAPI type, its other names). The
+# parsers return None for an invalid value.
+OPTION_NAMES = {
+    "color_text": (parse_bool, "boolean", ("c", "color")),
+    "text_only": (parse_bool, "boolean", ("t", "text")),
+    "version": (parse_version, "string", ("v",)),
+    "length": (parse_size, "integer", ("l",)),
+    "width": (parse_size, "integer", ("w",)),
+    "verse_numbers": (parse_bool, "boolean", ("n", "numbers")),
+    "return_json": (parse_bool, "boolean", ("j", "json")),
+    "stream": (parse_bool, "boolean", ("s",)),
+    "page": (parse_page, "integer", ("p",)),
+    "versions": (parse_version, "string", ()),
+}
+# Every name of an option -> (option, parser)
+OPTION_ALIASES = {
+    name: (option, parser)
+    for option, (parser, _, aliases) in OPTION_NAMES.items()
+    for name in (option, *aliases)
+}
+# Option -> its name in JSON responses
+JSON_NAMES = {
+    "color_text": "c",
+    "text_only": "t",
+    "version": "v",
+    "length": "l",
+    "width": "w",
+}
+
+
+def parse_option(name: str, value: str, values: dict) -> None:
+    """
+    Parse 'value' into 'values' if 'name' is a name of an option (other
+    parameters are not options).
+    Raises:
+        UserError: the value isn't valid for the option.
+    """
+    option, parser = OPTION_ALIASES.get(name, (None, None))
+    if option is None:
+        return
+    parsed = parser(value)
+    if parsed is None:
+        raise UserError(f"Invalid value '{value}' for the option {name}.")
+    values[option] = parsed
+
+
+def parse_option_string(option_string: str) -> dict:
+    """
+    Parse the options the user passes all attached to the 'options' parameter:
+    'w=78,v=BBE,length=85,c=no' -> {'width': 78, 'version': 'BBE', ...}
+    """
+    values = {}
+    name = None
+    for item in option_string.replace("'", "").split(","):
+        # 'versions=ASV,KJV' was split into 'versions=ASV' and 'KJV'
+        if "=" not in item and "versions" in values and name == "versions":
+            values["versions"] += f",{item.upper()}"
+            continue
+        name, _, value = item.partition("=")
+        # 'options=v=BBE' attached twice
+        while name in ("o", "options") and "=" in value:
+            name, _, value = value.partition("=")
+        parse_option(name, value, values)
+    return values
+
+
+@lru_cache(maxsize=4096)
+def parse_options(query_string: str) -> Options:
+    """
+    Parse the options of a request from its query string in a single pass.
+    Every option has a long and a short name ('length', 'l'), and can also be
+    passed in the 'options' parameter (see parse_option_string), which the
+    separate parameters take precedence over.
+    The same query string always returns the same Options object.
+    Raises:
+        UserError: the value of an option isn't valid.
+    """
+    values = {}
+    option_string = None
+    for name, value in parse_qsl(query_string, keep_blank_values=True):
+        if name == "options":
+            option_string = value
         else:
-            return option
-
-
-class Options(BaseModel):
-    color_text: bool | None = Field(default=True, alias="c")
-    text_only: bool | None = Field(default=settings.TEXT_ONLY_DEFAULT, alias="t")
-    version: str | None = Field(default=settings.VERSION_DEFAULT, alias="v")
-    length: int | None = Field(
-        default=settings.LENGTH_DEFAULT,
-        gt=settings.MIN_SIZE,
-        lt=settings.MAX_SIZE,
-        alias="l",
-    )
-    width: int | None = Field(
-        default=settings.WIDTH_DEFAULT,
-        gt=settings.MIN_SIZE,
-        lt=settings.MAX_SIZE,
-        alias="w",
-    )
-    verse_numbers: bool | None = Field(
-        default=settings.VERSE_NUMBERS,
-        validation_alias=AliasChoices("n", "verse_numbers", "numbers"),
-    )
-    return_json: bool | None = Field(
-        default=False,
-        validation_alias=AliasChoices("j", "return_json", "json"),
-    )
-    options: str | None = None
-    request: Request = None
-
-    model_config = ConfigDict(arbitrary_types_allowed=True, validate_return=True)
-
-    # pylint: disable=no-self-argument
-    @field_validator("request")
-    def request_validator(cls, user_options, values):
-        if user_options is None or len(user_options.query_params) == 0:
-            return values
-        default_options = OptionsNames()
-        params = dict(user_options.query_params)
-        for param in params:
-            request_value = params[param]
-            full_name = default_options.to_long(param)
-            if full_name in values.data:
-                if full_name in [
-                    "color_text",
-                    "text_only",
-                    "verse_numbers",
-                    "return_json",
-                ]:
-                    values.data[full_name] = is_bool(request_value)
-                if (
-                    full_name in ["length", "width"]
-                    and (isinstance(request_value, int) or params[param].isnumeric())
-                    and (settings.MIN_SIZE < int(request_value) <= settings.MAX_SIZE)
-                ):
-                    values.data[full_name] = int(request_value)
-
-                if full_name == "version" and len(request_value) == 3:
-                    values.data[full_name] = request_value.upper()
-
-        return values
-
-    # pylint: disable=no-self-argument
-    @field_validator("options")
-    def name_must_contain_space(cls, user_options, values):
-        """
-        Parse the options parameter the user passes in a list of options all attached to the option parameter.
-        Takes the argument "options=w=78,v=BBE,length=85,c=no", and update the options Object
-        """
-        default_options = OptionsNames()
-        default_values = deepcopy(default_options.values)
-        if user_options == "" or user_options is None:
-            return user_options
-
-        # Parse the options string into its constitutent parts
-        # Turns string 'w=78,v=BBE,length=85,c=no' into list ['w=78', 'v=BBE', 'length=85', 'c=no']
-        parsed_option_string = (
-            user_options.replace("o=", "")
-            .replace("options=", "")
-            .replace("'", "")
-            .split(",")
-        )
+            parse_option(name, value, values)
+    if option_string is None:
+        return Options(**values)
+    return Options(**{**parse_option_string(option_string), **values})
 
-        option_list = [i.split("=") for i in parsed_option_string]
 
-        # Parse through the options and update the dictionary if the option is there
-        for option in option_list:
-            option_name = option[0]
-            option_value = option[1]
+def request_options(request: Request) -> Options:
+    """
+    FastAPI dependency returning the options of the request (see parse_options).
+    """
+    return parse_options(request.scope["query_string"].decode("latin-1"))
 
-            # If the user passes in a valid option, update the default value
-            #   Ex: 'l':45 will be converted into 'length':45 and replace the default value
-            default_values[default_options.to_long(option_name)] = option_value
 
-        # Update the options passed to FastAPI to match the default_options dict.
-        values.data["color_text"] = is_bool(default_values.get("color_text"))
-        values.data["text_only"] = is_bool(default_values.get("text_only"))
-        values.data["verse_numbers"] = is_bool(default_values.get("verse_numbers"))
-        values.data["return_json"] = is_bool(default_values.get("return_json"))
+def options_openapi() -> dict:
+    """
+    Describe the option parameters in the OpenAPI schema of the routes taking
+    Options (which are parsed from the query string, see request_options).
+    """
+    parameters = [
+        {
+            "name": aliases[0] if aliases else option,
+            "in": "query",
+            "required": False,
+            "description": (
+                f"Also {', '.join((option, *aliases[1:]))}" if aliases else ""
+            ),
+            "schema": {"type": openapi_type, "title": option},
+        }
+        for option, (_, openapi_type, aliases) in OPTION_NAMES.items()
+    ]
+    parameters.append(
+        {
+            "name": "options",
+            "in": "query",
+            "required": False,
+            "description": "Several options at once: 'l=50,w=85,c=False,v=BBE'",
+            "schema": {"type": "string", "title": "options"},
+        }
+    )
+    return {"parameters": parameters}
 
-        # Ensure that 'width' or 'length' are integers and they are greater than 0
-        if (isinstance(default_values.get("length"), int)) or (
-            str(default_values.get("length")).isnumeric()
-            and int(default_values.get("length")) > 0
-        ):
-            values.data["length"] = int(default_values["length"])
 
-        if (isinstance(default_values["width"], int)) or (
-            str(default_values["width"]).isnumeric()
-            and int(default_values["width"]) > 0
-        ):
-            values.data["width"] = int(default_values["width"])
+class BatchReference(BaseModel):
+    reference: str
+    version: str | None = None
 
-        if len(default_values["version"]) == 3:
-            values.data["version"] = default_values["version"].upper()
 
-        return user_options
+class BatchRequest(BaseModel):
+    """
+    Body of POST /batch. Each reference is either a string ('John:3:16') or
+    an object that also picks the version of that one reference.
+    """
 
-    def update(self, user_options: dict) -> str:
-        """
-        Parse 'small' arguments passed in separately like 'w=15&l=54' and update the
-        user Options object
-        """
-        params = dict(user_options.query_params)
-        options_set = set(("l", "w", "v", "t", "c", "n", "j"))
-        # Only parse them if the user passes in options with one of the values in 'options_set'
-        short_options = options_set.intersection(params)
-        if short_options is not None:
-            for key in short_options:
-                value = params[key]
-                if key == "l":
-                    if str.isnumeric(value) and int(value) > 0:
-                        self.length = int(value)
-                elif key == "w":
-                    if str.isnumeric(value) and int(value) > 0:
-                        self.width = int(value)
-                elif key == "c":
-                    self.color_text = is_bool(value)
-                elif key == "t":
-                    self.text_only = is_bool(value)
-                elif key == "v":
-                    if len(value) == 3:
-                        self.version = value.upper()
-                elif key == "n":
-                    self.verse_numbers = is_bool(value)
-                elif key == "j":
-                    self.return_json = is_bool(value)
-        return " "
+    references: list[str | BatchReference]
 
 
 class UserError(HTTPException):
@@ -364,7 +756,163 @@ class ProgrammerError(HTTPException):
         )
 
 
-def create_book(bible_verse: str, user_options: Options, request_verse: dict):
+def book_header(title: str, page_width: int) -> list:
+    """
+    The three lines at the start of a page of the book, with 'title' centered.
+    """
+    spaced_title = (page_width - len(title)) // 2
+    return ["", " " * spaced_title + title + " " * (spaced_title - 1), ""]
+
+
+class BookPages:
+    """
+    Split the text of a book into pages, each one a full (two page) spread of
+    the book, so long passages can be read a page at a time instead of being
+    cut off. The text is only wrapped up to the page being read, and the
+    wrapped lines are shared between requests for the same text and width.
+    """
+
+    def __init__(
+        self, bible_verse: str, user_options: Options, request_verse: str
+    ) -> None:
+        if user_options is not None:
+            self.length = user_options.length
+            width = user_options.width
+            color_text = user_options.color_text
+        else:
+            width = 80
+            self.length = 20
+            color_text = True
+        self.template = book_template(width, color_text)
+        page_width = self.template.page_width
+
+        header = book_header("".join(request_verse), page_width)
+        self.lines = BookLines(header, wrapped_text(bible_verse, width // 2 - 2))
+        self.row_count = self.length // 2
+        self.lines_per_page = 2 * self.row_count
+
+    def first_line(self, page: int) -> int:
+        return (page - 1) * self.lines_per_page
+
+    def has_page(self, page: int) -> bool:
+        return page == 1 or (page > 1 and self.lines.has(self.first_line(page)))
+
+    def next_page(self, page: int) -> int | None:
+        return page + 1 if self.has_page(page + 1) else None
+
+    def text(self, page: int) -> str:
+        """
+        The part of the text shown on 'page'.
+        """
+        start = self.lines.offset(self.first_line(page))
+        end = self.lines.offset(self.first_line(page + 1))
+        return self.lines.wrapped.text[start:end].strip()
+
+    def rows(self, page: int):
+        """
+        Yield the middle rows of 'page'. The last line is marked with '...'
+        when the text continues on the next page.
+        """
+        template = self.template
+        first = self.first_line(page)
+        for i in range(self.row_count):
+            left = first + i
+            right = left + self.row_count
+            if not self.lines.has(left):
+                yield template.empty_row
+            elif not self.lines.has(right):
+                yield template.row(self.lines[left])
+            elif i == self.row_count - 1 and self.lines.has(right + 1):
+                last_text = self.lines[right] + "..."
+                yield template.row(
+                    self.lines[left], last_text[: template.page_width - 2]
+                )
+            else:
+                yield template.row(self.lines[left], self.lines[right])
+
+
+class ParallelPages:
+    """
+    Several versions of the same passage side by side in the book: one
+    version per page, two per spread, and as many spreads as needed. Like
+    BookPages, long passages are read a page at a time, 'page' showing the
+    same lines of every version.
+    """
+
+    def __init__(self, texts: dict, user_options: Options, request_verse: str) -> None:
+        """
+        Args:
+            texts(dict): The text of each version, in the order to show them.
+        """
+        width = user_options.width
+        self.template = book_template(width, user_options.color_text)
+        page_width = self.template.page_width
+        self.row_count = user_options.length // 2
+        self.texts = texts
+        self.columns = [
+            BookLines(
+                book_header(
+                    shorten(f"{request_verse} ({version})", width=page_width - 2),
+                    page_width,
+                ),
+                wrapped_text(text, width // 2 - 2),
+            )
+            for version, text in texts.items()
+        ]
+
+    def first_line(self, page: int) -> int:
+        return (page - 1) * self.row_count
+
+    def has_page(self, page: int) -> bool:
+        return page == 1 or (
+            page > 1
+            and any(column.has(self.first_line(page)) for column in self.columns)
+        )
+
+    def next_page(self, page: int) -> int | None:
+        return page + 1 if self.has_page(page + 1) else None
+
+    def text(self, page: int) -> dict:
+        """
+        The part of the text of each version shown on 'page'.
+        """
+        texts = {}
+        for version, column in zip(self.texts, self.columns):
+            start = column.offset(self.first_line(page))
+            end = column.offset(self.first_line(page + 1))
+            texts[version] = column.wrapped.text[start:end].strip()
+        return texts
+
+    def line(self, column: BookLines, index: int, last: bool) -> str:
+        """
+        Line 'index' of a page, marked with '...' if it is the 'last' line of
+        the page and the text continues.
+        """
+        if column is None or not column.has(index):
+            return None
+        if last and column.has(index + 1):
+            return (column[index] + "...")[: self.template.page_width - 2]
+        return column[index]
+
+    def rows(self, page: int):
+        """
+        Yield every row of every spread of 'page'.
+        """
+        template = self.template
+        first = self.first_line(page)
+        for start in range(0, len(self.columns), 2):
+            left = self.columns[start]
+            right = self.columns[start + 1] if start + 1 < len(self.columns) else None
+            yield template.top
+            for i in range(self.row_count):
+                last = i == self.row_count - 1
+                yield template.row(
+                    self.line(left, first + i, last), self.line(right, first + i, last)
+                )
+            yield template.bottom
+
+
+def create_book_rows(bible_verse: str, user_options: Options, request_verse: dict):
     """
     start                middle                 end
     |                    |                     |
@@ -386,278 +934,490 @@ def create_book(bible_verse: str, user_options: Options, request_verse: dict):
     `--------------------~___~--------------------𝅪 <─ bottom_final_pg
     This book is rendered using static parts (mostly the corners and the middle)
     and the rest is generated dynamically based on the parameters passed in.
-    """
-    book = Book()
-    basicConfig(level=INFO, filename="config.log")
 
-    if user_options is not None:
-        length = user_options.length
-        width = user_options.width
-        if user_options.color_text:
-            book_parts = book.get_color()
+    The book is yielded one row at a time (the top, each middle row, then the
+    bottom) and the text is only wrapped as far as the rows need it.
+    """
+    configure_logging()
+    pages = BookPages(bible_verse, user_options, request_verse)
+    template = pages.template
+
+    yield template.top
+
+    if user_options is not None and user_options.page is not None:
+        yield from pages.rows(user_options.page)
+        yield template.bottom
+        return
+
+    formatted_text = pages.lines
+    page_width = template.page_width
+    rows = pages.row_count
+    second_page_start = ceil(pages.length / 2)
+    for i in range(rows):
+        second_text_index = second_page_start + i
+        # The last line of the second page is marked with '...'
+        if i == rows - 1:
+            if not formatted_text.has(second_text_index):
+                continue
+            last_text = formatted_text[second_text_index] + "..."
+            if len(last_text) > page_width - 2:
+                last_text = last_text[: page_width - 2]
+            yield template.row(formatted_text[i], last_text)
+        # If too big for first, don't display any text
+        elif not formatted_text.has(i):
+            yield template.empty_row
+        # If too big for second text, only display the first
+        elif not formatted_text.has(second_text_index):
+            yield template.row(formatted_text[i])
+        # Display text regularly
         else:
-            book_parts = book.get_no_color()
-        splitter = TextWrapper(width=user_options.width // 2 - 2)
-
-    else:
-        width = 80
-        length = 20
-        splitter = TextWrapper(width=38)
-        book_parts = book.get_color()
-
-    formatted_text = splitter.wrap(bible_verse)
-    final_book_middle_array = []
-    page_width = width // 2
-    # Add three lines to the start of the verses
-    formatted_verse = "".join(request_verse)
-    spaced_verse = (page_width - len(formatted_verse)) // 2
-    formatted_text.insert(0, "")
-    formatted_text.insert(
-        0, " " * spaced_verse + formatted_verse + " " * (spaced_verse - 1)
-    )
-    formatted_text.insert(0, "")
-
-    # Generating the book in this way allows for the easy modification of
-    # book generation.
-    final_book_top = (
-        "    "
-        + book_parts["top_level"] * page_width
-        + " "
-        + book_parts["top_level"] * page_width
-        + "    \n"
-        + book_parts["top_start"]
-        + " " * (page_width - 1)
-        + book_parts["top_middle"]
-        + " " * (page_width - 1)
-        + book_parts["top_end"]
-    )
+            yield template.row(formatted_text[i], formatted_text[second_text_index])
 
-    for i in range((length // 2)):
-        try:
-            if i < len(formatted_text):
-                text = formatted_text[i]
-                second_text_index = ceil(length / 2) + i
-
-            if i == (length // 2 - 1):
-                if len(formatted_text) == second_text_index and (
-                    len(formatted_text[second_text_index]) >= page_width - 3
-                ):
-                    formatted_text[second_text_index] = (
-                        formatted_text[second_text_index][:-3] + "..."
-                    )
-                else:
-                    if len(formatted_text[second_text_index] + "...") > page_width - 2:
-                        # Strip out extra ... if they exist
-                        formatted_text[second_text_index] += "..."
-                        formatted_text[second_text_index] = formatted_text[
-                            second_text_index
-                        ][: page_width - 2]
-                    else:
-                        formatted_text[second_text_index] += "..."
-            # If too big for second text, only display the first
-            if i < len(formatted_text) and second_text_index >= len(formatted_text):
-                final_book_middle_array.append(
-                    book_parts["middle_start"]
-                    + f" {text}"
-                    + " " * (page_width - (len(text) + 1))
-                    + book_parts["middle"]
-                    + " " * (page_width)
-                    + book_parts["middle_end"]
-                    + "\n"
-                )  # nopep8
-            # If too big for first, don't display any text
-            elif i >= len(formatted_text):
-                final_book_middle_array.append(
-                    book_parts["middle_start"]
-                    + " " * (page_width)
-                    + book_parts["middle"]
-                    + " " * (page_width)
-                    + book_parts["middle_end"]
-                    + "\n"
-                )  # nopep8
-            # Display text regularly
-            else:
-                final_book_middle_array.append(
-                    book_parts["middle_start"]
-                    + f" {text}"
-                    + " " * (page_width - (len(text) + 1))
-                    + book_parts["middle"]
-                    + f" {formatted_text[second_text_index]}"
-                    + " " * (page_width - (len(formatted_text[second_text_index]) + 1))
-                    + book_parts["middle_end"]
-                    + "\n"
-                )  # nopep8
+    yield template.bottom
 
-        except Exception as e:
-            print(e)
 
-            continue
+def create_book(bible_verse: str, user_options: Options, request_verse: dict):
+    """
+    Render the whole book (see create_book_rows) as a single string.
+    """
+    return "".join(create_book_rows(bible_verse, user_options, request_verse))
 
-    final_bottom_single_pg = (
-        book_parts["bottom_single_pg_start"]
-        + book_parts["top_level"] * (page_width - 1)
-        + book_parts["bottom_single_pg_middle"]
-        + book_parts["top_level"] * (page_width - 1)
-        + book_parts["bottom_single_pg_end"]
-        + "\n"
-    )
 
-    final_bottom_multi_pg = (
-        book_parts["bottom_multi_pg_left"]
-        + "=" * (page_width - 1)
-        + book_parts["bottom_multi_pg_middle"]
-        + "=" * (page_width - 1)
-        + book_parts["bottom_multi_pg_end"]
-        + "\n"
-    )
+def create_parallel_book(texts: dict, user_options: Options, request_verse: str):
+    """
+    Render several versions of a passage side by side (see ParallelPages).
+    """
+    pages = ParallelPages(texts, user_options, request_verse)
+    return "".join(pages.rows(user_options.page or 1))
 
-    final_bottom_final_pg = (
-        book_parts["bottom_final_pg_left"]
-        + "-" * (page_width - 2)
-        + book_parts["bottom_final_pg_middle"]
-        + "-" * (page_width - 2)
-        + book_parts["bottom_final_pg_end"]
-        + "\n"
-    )
 
-    return (
-        final_book_top
-        + "".join(final_book_middle_array)
-        + final_bottom_single_pg
-        + final_bottom_multi_pg
-        + final_bottom_final_pg
-    )
+def apply_docs_referer(options, request):
+    """
+    Requests made from the interactive docs can't display the book, so only
+    return the text.
+    Returns:
+        (Options): The options to render the request with.
+    """
+    referer = request.headers.get("referer") if request is not None else None
+    if options is not None and referer is not None and "/docs" in referer:
+        return options._replace(text_only=True)
+    return options
 
 
-def multi_query(db, **kwargs) -> str:
+def select_version(kwargs: dict) -> tuple:
+    """
+    Pop the options and request out of the query arguments and pick the table
+    of the requested version.
+    Returns:
+        (tuple): The user options and the ORM class to query.
+    """
     options = kwargs.pop("options")
     request = kwargs.pop("request")
-    referer = request.headers.get("referer")
-    if request is not None and referer is not None and "/docs" in referer:
-        options.text_only = True
-    if options is not None:
-        if options.version == "ASV":
-            version = schemas.TableASV
-        elif options.version == "BBE":
-            version = schemas.TableBBE
-        elif options.version == "JKV":
-            version = schemas.TableKJV
-        elif options.version == "WEB":
-            version = schemas.TableWEB
-        elif options.version == "YLT":
-            version = schemas.TableYLT
-    else:
-        version = schemas.TableASV
+    options = apply_docs_referer(options, request)
+    if options is None:
+        return options, schemas.TableASV
+    version = schemas.TRANSLATION_TABLES.get(str(options.version).upper())
+    if version is None:
+        raise UserError(f"Version {options.version} not found.")
+    return options, version
+
+
+def requested_versions(options) -> list:
+    """
+    Return the versions of the 'versions' option ('ASV,KJV,WEB') in the order
+    given, or an empty list if it isn't set.
+    Raises:
+        UserError: one of the versions doesn't exist.
+    """
+    if options is None or not options.versions:
+        return []
+    versions = []
+    # A '+' in the URL is a space
+    for version in options.versions.replace(" ", ",").split(","):
+        version = version.strip().upper()
+        if not version or version in versions:
+            continue
+        if version not in schemas.TRANSLATION_TABLES:
+            raise UserError(f"Version {version} not found.")
+        versions.append(version)
+    return versions
+
+
+def verse_statement(version, **kwargs):
+    """
+    Build the query for the verses described by the (flattened) arguments.
+    """
+    # Multi verse, different chapter (or book): one range of ids
+    if "chapter_start" in kwargs:
+        if set(kwargs.keys()) - {"book_end"} != RANGE_KEYS:
+            raise UserError("verse not found")
+        return (
+            select(version)
+            .where(version.id.between(*verse_id_range(kwargs)))
+            .order_by(version.id)
+        )
+
+    statement = (
+        select(version).where(version.book == kwargs.get("book")).order_by(version.id)
+    )
 
     # Query single verse
     if {"book", "chapter", "verse"} == set(kwargs.keys()):
-        try:
-            data = (
-                db.query(version)
-                .filter(version.book == kwargs.get("book"))
-                .filter(version.chapter == kwargs.get("chapter"))
-                .filter(version.verse == kwargs.get("verse"))
-            ).all()
-
-        except Exception as e:
-            raise ProgrammerError(repr(e)) from e
+        return statement.where(version.chapter == kwargs.get("chapter")).where(
+            version.verse == kwargs.get("verse")
+        )
 
     # Entire chapter
-    elif {"book", "chapter"} == set(kwargs.keys()):
-        try:
-            data = (
-                db.query(version)
-                .filter(version.book == kwargs.get("book"))
-                .filter(version.chapter == kwargs.get("chapter"))
-            ).all()
+    if {"book", "chapter"} == set(kwargs.keys()):
+        return statement.where(version.chapter == kwargs.get("chapter"))
+
+    # Multi verse, same chapter
+    if {"book", "chapter", "verse_start", "verse_end"} == set(kwargs.keys()):
+        return statement.where(version.chapter == kwargs.get("chapter")).where(
+            version.verse.between(kwargs.get("verse_start"), kwargs.get("verse_end"))
+        )
+
+    raise UserError("verse not found")
+
 
+def corpus_query(options, **kwargs):
+    """
+    Serve the verses from the in-memory corpus.
+    Returns:
+        (list): The verses, or None if the corpus doesn't hold this version.
+    """
+    if options is None or not corpus.has_translation(options.version):
+        return None
+    try:
+        return corpus.lookup(
+            options.version, limit=settings.MAX_RANGE_VERSES + 1, **kwargs
+        )
+    except (KeyError, ValueError) as e:
+        raise UserError("verse not found") from e
+
+
+def reference_verses(kwargs: dict) -> list:
+    """
+    Return the (book, chapter, verse) of each end of the (flattened)
+    arguments, the verse being None for an entire chapter.
+    """
+    args = {
+        key: int(value) for key, value in kwargs.items() if key in Reference._fields
+    }
+    book = args["book"]
+    if "chapter_start" in args:
+        return [
+            (book, args["chapter_start"], args["verse_start"]),
+            (args.get("book_end", book), args["chapter_end"], args["verse_end"]),
+        ]
+    if "verse_start" in args:
+        return [
+            (book, args["chapter"], args["verse_start"]),
+            (book, args["chapter"], args["verse_end"]),
+        ]
+    return [(book, args["chapter"], args.get("verse"))]
+
+
+def check_bounds(version: str, kwargs: dict) -> None:
+    """
+    Refuse (flattened) arguments naming a chapter or a verse that doesn't
+    exist in 'version', if its bounds are loaded (see VerseBounds).
+    Raises:
+        UserError: the chapter or the verse doesn't exist.
+    """
+    if not verse_bounds.has_translation(version):
+        return
+    for book, chapter, verse in reference_verses(kwargs):
+        last_verse = verse_bounds.last_verse(version, book, chapter)
+        name = book_index.primary_name(book)
+        if last_verse is None:
+            raise UserError(f"Chapter {name} {chapter} not found.")
+        if verse is not None and not 1 <= verse <= last_verse:
+            raise UserError(
+                f"Verse {name} {chapter}:{verse} not found, the chapter has {last_verse} verses."
+            )
+
+
+def check_range_size(verses: int) -> None:
+    """
+    Refuse a reference covering more than MAX_RANGE_VERSES verses (the
+    verses are fetched with a limit of one more, see range_statement).
+    Raises:
+        UserError: the reference covers too many verses.
+    """
+    if verses > settings.MAX_RANGE_VERSES:
+        raise UserError(
+            f"Too many verses! At most {settings.MAX_RANGE_VERSES} are returned per reference."
+        )
+
+
+def check_batch_size(verses: int) -> None:
+    """
+    Refuse a batch fetching more than BATCH_MAX_VERSES verses in total
+    (see async_batch_query).
+    Raises:
+        UserError: the batch covers too many verses.
+    """
+    if verses > settings.BATCH_MAX_VERSES:
+        raise UserError(
+            f"Too many verses! At most {settings.BATCH_MAX_VERSES} are returned per batch."
+        )
+
+
+def range_statement(version, **kwargs):
+    """
+    verse_statement, limited to one verse more than MAX_RANGE_VERSES (enough
+    to tell the reference covers too many verses, see check_range_size).
+    """
+    return verse_statement(version, **kwargs).limit(settings.MAX_RANGE_VERSES + 1)
+
+
+def format_verses(data, options, kwargs: dict) -> dict:
+    """
+    Join the queried verses into a single string (with superscript verse
+    numbers if requested) and add it to the arguments.
+    """
+    if options.verse_numbers:
+        # Converts verse numbers into their uppercase version
+        text = " ".join(
+            [
+                "".join(
+                    [
+                        settings.REGULAR_TO_SUPERSCRIPT.get(num)
+                        for num in [*str(query.verse)]
+                    ]
+                )
+                + query.text
+                for query in data
+            ]
+        )
+    else:
+        text = " ".join([query.text for query in data])
+    kwargs["text"] = text
+    kwargs["options"] = options
+    return kwargs
+
+
+def interleave_verses(verses: dict) -> str:
+    """
+    Text of several versions of the same verses, verse by verse:
+        John 3:16
+        ASV For God so loved the world, ...
+        KJV For God so loved the world, ...
+    Args:
+        verses(dict): The verses of each version, in the order to show them.
+    """
+    lines = {}
+    for version, rows in verses.items():
+        for row in rows:
+            lines.setdefault((row.book, row.chapter, row.verse), []).append(
+                f"{version} {row.text}"
+            )
+    return "\n\n".join(
+        f"{book_index.primary_name(book)} {chapter}:{verse}\n" + "\n".join(texts)
+        for (book, chapter, verse), texts in sorted(lines.items())
+    )
+
+
+async def async_multi_query(db, **kwargs) -> str:
+    """
+    Fetch the verses described by the (flattened) arguments, from the corpus
+    if it holds the version, and join them (see format_verses).
+    """
+    options, version = select_version(kwargs)
+
+    data = corpus_query(options, **kwargs)
+    if data is None:
+        statement = range_statement(version, **kwargs)
+        try:
+            data = (await db.execute(statement)).scalars().all()
         except Exception as e:
             raise ProgrammerError(repr(e)) from e
+    check_range_size(len(data))
 
-    # Multi verse, same chapter
-    elif {"book", "chapter", "verse_start", "verse_end"} == set(kwargs.keys()):
-        try:
-            data = (
-                db.query(version)
-                .filter(version.book == kwargs.get("book"))
-                .filter(version.chapter == kwargs.get("chapter"))
-                .filter(
-                    version.verse.between(
-                        kwargs.get("verse_start"), kwargs.get("verse_end")
-                    )
+    return format_verses(data, options, kwargs)
+
+
+def parallel_statement(versions: list, **kwargs):
+    """
+    Build a single UNION ALL query for the verses described by the (flattened)
+    arguments in every version of 'versions', each row tagged with its version.
+    Limited to MAX_RANGE_VERSES rows per version, and one more (enough to
+    tell a version covers too many verses, see check_range_size).
+    """
+    statements = []
+    for version in versions:
+        table = schemas.TRANSLATION_TABLES[version]
+        statements.append(
+            verse_statement(table, **kwargs)
+            .order_by(None)
+            .with_only_columns(
+                literal(version).label("version"),
+                table.id,
+                table.book,
+                table.chapter,
+                table.verse,
+                table.text,
+            )
+        )
+    return (
+        union_all(*statements)
+        .order_by("id")
+        .limit(settings.MAX_RANGE_VERSES * len(versions) + 1)
+    )
+
+
+async def async_parallel_query(db, versions: list, **kwargs) -> dict:
+    """
+    Fetch the verses described by the (flattened) arguments in several
+    versions at once. The versions held in the corpus are served from memory,
+    the rest are fetched with a single query.
+    Returns:
+        (dict): The verses of each version, in the order of 'versions'.
+    """
+    kwargs.pop("options", None)
+    kwargs.pop("request", None)
+    verses = {version: [] for version in versions}
+    pending = []
+    for version in versions:
+        if corpus.has_translation(version):
+            try:
+                verses[version] = corpus.lookup(
+                    version, limit=settings.MAX_RANGE_VERSES + 1, **kwargs
                 )
-            ).all()
+            except (KeyError, ValueError) as e:
+                raise UserError("verse not found") from e
+        else:
+            pending.append(version)
 
+    if pending:
+        statement = parallel_statement(pending, **kwargs)
+        try:
+            rows = (await db.execute(statement)).all()
         except Exception as e:
             raise ProgrammerError(repr(e)) from e
+        # More rows than every version may have: cut short by the limit
+        if len(rows) > settings.MAX_RANGE_VERSES * len(pending):
+            check_range_size(len(rows))
+        for row in rows:
+            verses[row.version].append(row)
+
+    for rows in verses.values():
+        check_range_size(len(rows))
+    return verses
+
+
+def verse_id_range(kwargs: dict) -> tuple:
+    """
+    Return the first and last verse id (book * 1000000 + chapter * 1000 + verse)
+    covered by the (flattened) arguments.
+    """
+    args = {key: int(value) for key, value in kwargs.items()}
+    book = args.get("book")
+    if "chapter_start" in args:
+        return (
+            verse_id(book, args["chapter_start"], args["verse_start"]),
+            verse_id(
+                args.get("book_end", book), args["chapter_end"], args["verse_end"]
+            ),
+        )
+    if "verse" in args:
+        start = end = args["verse"]
+    elif "verse_start" in args:
+        start, end = args["verse_start"], args["verse_end"]
+    else:
+        start, end = 0, 999
+    return verse_id(book, args["chapter"], start), verse_id(book, args["chapter"], end)
 
-    # Multi verse, different chapter
-    elif set(
-        ["book", "chapter_start", "chapter_end", "verse_start", "verse_end"]
-    ) == set(kwargs.keys()):
-        try:
-            data = (
-                db.query(version)
-                .filter(version.book == kwargs.get("book"))
-                .filter(
-                    version.chapter.between(
-                        kwargs.get("chapter_start"), kwargs.get("chapter_end")
-                    )
-                )
-                .filter(
-                    version.id.between(
-                        "".join(
-                            [
-                                kwargs.get("book"),
-                                kwargs.get("chapter_start"),
-                                kwargs.get("verse_start"),
-                            ]
-                        ),
-                        "".join(
-                            [
-                                kwargs.get("book"),
-                                kwargs.get("chapter_end"),
-                                kwargs.get("verse_end"),
-                            ]
-                        ),
-                    )
-                )
-            ).all()
 
+async def async_batch_query(db, items: list) -> list:
+    """
+    Fetch the verses of many references at once.
+    Every reference of a version held in the corpus is served from memory,
+    the rest are fetched with a single query per version.
+    No more than BATCH_MAX_VERSES verses are returned for the whole batch,
+    a reference counting for MAX_RANGE_VERSES + 1 at most (larger ones are
+    refused on their own, see check_range_size).
+    Args:
+        items(list): (version, flattened arguments) of each reference.
+    Returns:
+        (list): The verses of each reference, in the same order.
+    Raises:
+        UserError: the references cover more than BATCH_MAX_VERSES verses.
+    """
+    results = [None] * len(items)
+    pending = {}
+    fetched = 0
+    for index, (version, kwargs) in enumerate(items):
+        if corpus.has_translation(version):
+            remaining = settings.BATCH_MAX_VERSES - fetched
+            try:
+                results[index] = corpus.lookup(
+                    version,
+                    limit=min(settings.MAX_RANGE_VERSES, remaining) + 1,
+                    **kwargs,
+                )
+            except (KeyError, ValueError):
+                results[index] = []
+            fetched += len(results[index])
+            check_batch_size(fetched)
+        else:
+            pending.setdefault(version, []).append(index)
+
+    for version, indexes in pending.items():
+        table = schemas.TRANSLATION_TABLES[version]
+        ranges = [verse_id_range(items[index][1]) for index in indexes]
+        statement = (
+            select(table)
+            .where(or_(*[table.id.between(start, end) for start, end in ranges]))
+            .order_by(table.id)
+            .limit(settings.BATCH_MAX_VERSES - fetched + 1)
+        )
+        try:
+            rows = (await db.execute(statement)).scalars().all()
         except Exception as e:
             raise ProgrammerError(repr(e)) from e
+        # Every row belongs to at least one reference
+        check_batch_size(fetched + len(rows))
+
+        # Rows are sorted by id, so each reference is a contiguous slice
+        ids = [row.id for row in rows]
+        for index, (start, end) in zip(indexes, ranges):
+            first = bisect_left(ids, start)
+            last = bisect_right(ids, end, first)
+            results[index] = rows[first:last]
+            fetched += min(len(results[index]), settings.MAX_RANGE_VERSES + 1)
+            check_batch_size(fetched)
+
+    return results
+
+
+async def async_verses_by_id(db, version: str, ids: list) -> list:
+    """
+    Fetch the verses with the given ids (see verse_id) in the same order,
+    from the corpus if it holds the version.
+    """
+    if corpus.has_translation(version):
+        translation = corpus.translations[version]
+        rows = []
+        for verse in ids:
+            rows.extend(translation.rows(*translation.range_rows(verse, verse)))
     else:
-        raise UserError("verse not found")
-    if data is not None:
-        if options.verse_numbers:
-            # Converts verse numbers into their uppercase version
-            text = " ".join(
-                [
-                    "".join(
-                        [
-                            settings.REGULAR_TO_SUPERSCRIPT.get(num)
-                            for num in [*str(query.verse)]
-                        ]
-                    )
-                    + query.text
-                    for query in data
-                ]
-            )
-            kwargs["text"] = text
-            kwargs["options"] = options
-            return kwargs
+        table = schemas.TRANSLATION_TABLES[version]
+        statement = select(table).where(table.id.in_(ids))
+        try:
+            rows = (await db.execute(statement)).scalars().all()
+        except Exception as e:
+            raise ProgrammerError(repr(e)) from e
 
-        text = " ".join([query.text for query in data])
-        kwargs["text"] = text
-        kwargs["options"] = options
-        return kwargs
+    verses = {verse_id(row.book, row.chapter, row.verse): row for row in rows}
+    return [verses[verse] for verse in ids if verse in verses]
 
 
-def flatten_args(db, **kwargs):
+def pad_arguments(kwargs: dict) -> dict:
     """
-    Convert regular bible verses into IDs
+    Zero pad the chapter and verse arguments to three digits.
     """
-    # if "request" in
     for argument in [
         "chapter",
         "chapter_start",
@@ -675,22 +1435,20 @@ def flatten_args(db, **kwargs):
             kwargs[argument] = "0" * (3 - len(kwargs.get(argument))) + kwargs.get(
                 argument
             )
+    return kwargs
 
-    if "book" in kwargs:
-        data = (
-            db.query(schemas.KeyAbbreviationsEnglish)
-            .filter(schemas.KeyAbbreviationsEnglish.name == kwargs.get("book"))
-            .filter(schemas.KeyAbbreviationsEnglish.primary == "1")
-        ).first()
-        if data is None:
-            data = (
-                db.query(schemas.KeyAbbreviationsEnglish).filter(
-                    schemas.KeyAbbreviationsEnglish.name == kwargs.get("book")
-                )
-            ).first()
-        if data is not None:
-            kwargs["book"] = str(data.book)
-        else:
-            raise UserError(f"Book {kwargs.get('book')} not found.")
+
+async def async_flatten_args(db, **kwargs):
+    """
+    Convert regular bible verses into IDs
+    """
+    pad_arguments(kwargs)
+
+    for key in sorted(BOOK_KEYS.intersection(kwargs)):
+        try:
+            book_id, _ = await async_resolve_book(db, kwargs.get(key))
+        except KeyError as e:
+            raise UserError(f"Book {kwargs.get(key)} not found.") from e
+        kwargs[key] = str(book_id)
 
     return kwargs
@@ -0,0 +1,351 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from hashlib import sha256
+from typing import NamedTuple
+
+# Corpus file layout (all integers are unsigned and little endian):
+#   header    magic, format version, length of the metadata
+#   metadata  JSON, per translation: row count and the position of each section
+#   sections  per translation: the sorted verse ids (uint32 per row), the byte
+#             offset of each verse in the text (uint32 per row + 1) and the
+#             UTF-8 text of every verse, one after the other.
+# Sections start on a 4 byte boundary so the arrays can be used in place.
+CORPUS_MAGIC = b"CBCORPUS"
+CORPUS_FORMAT_VERSION = 1
+CORPUS_HEADER = struct.Struct("<8sII")
+
+RANGE_KEYS = {"book", "chapter_start", "chapter_end", "verse_start", "verse_end"}
+
+
+def verse_id(book: int, chapter: int, verse: int) -> int:
+    """
+    The id of a verse in the t_* tables, e.g. John 3:16 is 43003016.
+    """
+    return book * 1_000_000 + chapter * 1000 + verse
+
+
+class CorpusVerse(NamedTuple):
+    """
+    A single verse served from the corpus. Mirrors the attributes of the
+    t_* ORM rows so the rest of the code can treat both the same way.
+    """
+
+    book: int
+    chapter: int
+    verse: int
+    text: str
+
+
+class Translation:
+    """
+    One translation stored as compact column arrays.
+
+    Row i is the verse (book[i], chapter[i], verse[i]) and its text is
+    text[offsets[i]:offsets[i + 1]]. Rows are kept in canonical
+    (book, chapter, verse) order, so every chapter (and every range of
+    verses, even across books) is a contiguous slice. 'ids' holds the sorted
+    verse id of every row, mapping any verse to its ordinal in the Bible.
+    """
+
+    __slots__ = ("book", "chapter", "verse", "ids", "offsets", "text", "chapters")
+
+    def __init__(self, rows) -> None:
+        self.book = array("B")
+        self.chapter = array("B")
+        self.verse = array("B")
+        self.ids = array("I")
+        self.offsets = array("I", [0])
+        # (book, chapter) -> (first row, last row + 1)
+        self.chapters = {}
+
+        parts = []
+        length = 0
+        for book, chapter, verse, text in sorted(rows, key=lambda row: row[:3]):
+            row = len(self.verse)
+            start, _ = self.chapters.get((book, chapter), (row, row))
+            self.chapters[(book, chapter)] = (start, row + 1)
+
+            self.book.append(book)
+            self.chapter.append(chapter)
+            self.verse.append(verse)
+            self.ids.append(verse_id(book, chapter, verse))
+            parts.append(text)
+            length += len(text)
+            self.offsets.append(length)
+        self.text = "".join(parts)
+
+    def __len__(self) -> int:
+        return len(self.verse)
+
+    def row(self, index: int) -> CorpusVerse:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return CorpusVerse(
+            self.book[index],
+            self.chapter[index],
+            self.verse[index],
+            self.text[start:end],
+        )
+
+    def rows(self, start: int, end: int) -> list:
+        return [self.row(index) for index in range(start, end)]
+
+    def chapter_rows(
+        self, book: int, chapter: int, verse_start: int = None, verse_end: int = None
+    ) -> tuple:
+        """
+        Return the (start, end) row slice of a chapter, optionally narrowed
+        to the verses between verse_start and verse_end (inclusive).
+        """
+        start, end = self.chapters.get((book, chapter), (0, 0))
+        if verse_start is not None:
+            start = bisect_left(self.verse, verse_start, start, end)
+        if verse_end is not None:
+            end = bisect_right(self.verse, verse_end, start, end)
+        return start, end
+
+    def range_rows(self, start_id: int, end_id: int) -> tuple:
+        """
+        Return the (start, end) row slice of every verse whose id is between
+        start_id and end_id (inclusive).
+        """
+        start = bisect_left(self.ids, start_id)
+        return start, bisect_right(self.ids, end_id, start)
+
+    def nbytes(self) -> int:
+        columns = (self.book, self.chapter, self.verse, self.ids, self.offsets)
+        return sum(column.itemsize * len(column) for column in columns) + len(
+            self.text.encode("utf-8")
+        )
+
+
+def section(buffer: memoryview, start: int, size: int) -> memoryview:
+    end = start + size
+    return buffer[start:end]
+
+
+class MappedTranslation:
+    """
+    A translation read in place from a memory mapped corpus file.
+
+    Works like Translation, but the ids, offsets and text are memoryviews
+    of the file, so every process mapping the file shares the same pages
+    and only the verses that are looked up are decoded.
+    """
+
+    __slots__ = ("ids", "offsets", "text")
+
+    def __init__(self, buffer: memoryview, sections: dict) -> None:
+        rows = sections["rows"]
+        self.ids = section(buffer, sections["ids"], 4 * rows).cast("I")
+        self.offsets = section(buffer, sections["offsets"], 4 * (rows + 1)).cast("I")
+        self.text = section(buffer, sections["text"], self.offsets[rows])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, index: int) -> CorpusVerse:
+        verse = self.ids[index]
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return CorpusVerse(
+            verse // 1_000_000,
+            verse // 1000 % 1000,
+            verse % 1000,
+            str(self.text[start:end], "utf-8"),
+        )
+
+    def rows(self, start: int, end: int) -> list:
+        return [self.row(index) for index in range(start, end)]
+
+    def chapter_rows(
+        self, book: int, chapter: int, verse_start: int = None, verse_end: int = None
+    ) -> tuple:
+        return self.range_rows(
+            verse_id(book, chapter, 0 if verse_start is None else verse_start),
+            verse_id(book, chapter, 999 if verse_end is None else verse_end),
+        )
+
+    def range_rows(self, start_id: int, end_id: int) -> tuple:
+        start = bisect_left(self.ids, start_id)
+        return start, bisect_right(self.ids, end_id, start)
+
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.offsets.nbytes + self.text.nbytes
+
+
+def write_corpus_file(path: str, translations: dict, metadata: dict = None) -> dict:
+    """
+    Write a corpus file (see CORPUS_MAGIC) holding every translation in
+    'translations' (version name -> (book, chapter, verse, text) rows).
+    Extra 'metadata' is stored alongside the layout of the file, along with
+    the sha256 checksum of the sections.
+    The file is written next to 'path' and moved into place once complete:
+    servers that mapped the old file keep reading it instead of crashing.
+    Returns:
+        (dict): The metadata written to the file.
+    """
+    sections = []
+    layout = {}
+    position = 0
+    for version, rows in translations.items():
+        translation = Translation(rows)
+        text = translation.text.encode("utf-8")
+        offsets = array("I", [0])
+        for index in range(len(translation)):
+            verse_text = translation.row(index).text
+            offsets.append(offsets[-1] + len(verse_text.encode("utf-8")))
+
+        layout[version] = {"rows": len(translation)}
+        for name, data in (
+            ("ids", translation.ids.tobytes()),
+            ("offsets", offsets.tobytes()),
+            ("text", text),
+        ):
+            layout[version][name] = position
+            padding = -len(data) % 4
+            sections.append(data + b"\0" * padding)
+            position += len(data) + padding
+
+    checksum = sha256()
+    for part in sections:
+        checksum.update(part)
+    metadata = dict(metadata or {}, translations=layout, checksum=checksum.hexdigest())
+    encoded = json.dumps(metadata).encode("utf-8")
+    encoded += b" " * (-(CORPUS_HEADER.size + len(encoded)) % 4)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(CORPUS_HEADER.pack(CORPUS_MAGIC, CORPUS_FORMAT_VERSION, len(encoded)))
+        f.write(encoded)
+        for part in sections:
+            f.write(part)
+    os.replace(temporary_path, path)
+    return metadata
+
+
+class VerseCorpus:
+    """
+    In-memory copy of every translation, used to answer verse lookups
+    without a database round trip. The text never changes, so it is loaded
+    once at startup (see CORPUS_ENABLED) and shared by every request, or
+    mapped from a corpus file (see CORPUS_PATH) shared by every worker.
+    """
+
+    def __init__(self) -> None:
+        self.translations = {}
+        self.metadata = {}
+
+    @property
+    def loaded(self) -> bool:
+        return len(self.translations) > 0
+
+    def has_translation(self, version: str) -> bool:
+        return version in self.translations
+
+    def add_translation(self, version: str, rows) -> Translation:
+        """
+        Add a translation from an iterable of (book, chapter, verse, text) rows.
+        """
+        translation = Translation(rows)
+        self.translations[version] = translation
+        return translation
+
+    def load(self, db, tables: dict) -> None:
+        """
+        Load every translation in 'tables' (version name -> ORM class) from the DB.
+        """
+        for version, table in tables.items():
+            self.add_translation(
+                version,
+                db.query(table.book, table.chapter, table.verse, table.text).order_by(
+                    table.id
+                ),
+            )
+
+    def map_file(self, path: str, verify: bool = False) -> None:
+        """
+        Serve every translation of a corpus file (see write_corpus_file)
+        straight from a read-only memory map of it.
+        With 'verify', the whole file is read once to check its checksum.
+        Raises:
+            ValueError: the file is not a corpus file this version can read,
+                or it doesn't match its checksum.
+        """
+        if sys.byteorder != "little":
+            raise ValueError("Corpus files can only be read on little endian machines")
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(mapped)
+
+        magic, version, length = CORPUS_HEADER.unpack_from(buffer)
+        if magic != CORPUS_MAGIC or version != CORPUS_FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {CORPUS_FORMAT_VERSION} corpus")
+        metadata = json.loads(bytes(section(buffer, CORPUS_HEADER.size, length)))
+        data_start = CORPUS_HEADER.size + length
+        data = buffer[data_start:]
+        if verify and sha256(data).hexdigest() != metadata.get("checksum"):
+            raise ValueError(f"{path} does not match its checksum")
+
+        # The map stays open for as long as any translation uses it
+        self.translations = {
+            version: MappedTranslation(data, sections)
+            for version, sections in metadata["translations"].items()
+        }
+        self.metadata = metadata
+
+    def clear(self) -> None:
+        self.translations = {}
+        self.metadata = {}
+
+    def nbytes(self) -> int:
+        return sum(translation.nbytes() for translation in self.translations.values())
+
+    def lookup(self, version: str, limit: int = None, **kwargs) -> list:
+        """
+        Return the verses matching the same keyword arguments async_multi_query accepts
+        (at most 'limit' of them, the first ones, like a query's LIMIT):
+            • book, chapter, verse
+            • book, chapter
+            • book, chapter, verse_start, verse_end
+            • book, chapter_start, chapter_end, verse_start, verse_end
+            • book, chapter_start, verse_start, book_end, chapter_end, verse_end
+        Values may be ints or (zero padded) numeric strings.
+        Raises:
+            KeyError: the version is not loaded or the arguments are not understood.
+        """
+        translation = self.translations[version]
+        args = {key: int(value) for key, value in kwargs.items()}
+        keys = set(args.keys())
+        book = args.get("book")
+
+        if keys == {"book", "chapter", "verse"}:
+            start, end = translation.chapter_rows(
+                book, args["chapter"], args["verse"], args["verse"]
+            )
+        elif keys == {"book", "chapter"}:
+            start, end = translation.chapter_rows(book, args["chapter"])
+        elif keys == {"book", "chapter", "verse_start", "verse_end"}:
+            start, end = translation.chapter_rows(
+                book, args["chapter"], args["verse_start"], args["verse_end"]
+            )
+        elif keys - {"book_end"} == RANGE_KEYS:
+            start, end = translation.range_rows(
+                verse_id(book, args["chapter_start"], args["verse_start"]),
+                verse_id(
+                    args.get("book_end", book), args["chapter_end"], args["verse_end"]
+                ),
+            )
+        else:
+            raise KeyError(f"Unsupported lookup {sorted(keys)}")
+
+        end = max(start, end)
+        if limit is not None:
+            end = min(end, start + limit)
+        return translation.rows(start, end)
+
+
+corpus = VerseCorpus()
@@ -1,65 +1,111 @@
-from socket import IPPROTO_TCP, gaierror, getaddrinfo
-from time import sleep
+from asyncio import sleep, wait_for
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy.orm.decl_api import DeclarativeMeta
 
 
 class DatabaseSettings(BaseSettings):
-    DEBUG: bool
-    DB_CONNECT_ATTEMPTS: int
-    MYSQL_USER: str
-    MYSQL_PASSWORD: str
-    MYSQL_HOST: str
-    MYSQL_DATABASE: str
-    MYSQL_DB_PORT: int
-    MYSQL_ROOT_USER: str
-    MYSQL_ROOT_PASSWORD: str
+    DEBUG: bool = False
+    # Startup waits for the DB with exponential backoff (in seconds)
+    DB_CONNECT_ATTEMPTS: int = 5
+    DB_CONNECT_BACKOFF: float = 0.5
+    DB_CONNECT_BACKOFF_MAX: float = 8.0
+    DB_CONNECT_TIMEOUT: float = 5.0
+    # "mariadb" or "sqlite" (a read-only file built by curl_bible.sqlite_loader)
+    DB_BACKEND: str = "mariadb"
+    SQLITE_PATH: str = "bible_db/bible.sqlite3"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    MYSQL_USER: str = ""
+    MYSQL_PASSWORD: str = ""
+    MYSQL_HOST: str = "localhost"
+    MYSQL_DATABASE: str = ""
+    MYSQL_DB_PORT: int = 3306
+    MYSQL_ROOT_USER: str = ""
+    MYSQL_ROOT_PASSWORD: str = ""
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
 db_settings = DatabaseSettings()
 
-# Turn DNS into IP address
-try:
-    address_info = getaddrinfo(db_settings.MYSQL_HOST, 3306, proto=IPPROTO_TCP)
-    db_settings.MYSQL_HOST = address_info[-1][-1][0]
-    print(f"Got db_host of {db_settings.MYSQL_HOST} ")
-except gaierror:
-    db_settings.MYSQL_HOST = "localhost"
 
-SQLALCHEMY_DATABASE_URL = f"mariadb+mariadbconnector://{db_settings.MYSQL_USER}:{db_settings.MYSQL_PASSWORD}@{db_settings.MYSQL_HOST}:{db_settings.MYSQL_DB_PORT}/{db_settings.MYSQL_DATABASE}?charset=utf8mb4"
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Memory map the (read-only) database so pages are read straight from the
+    OS page cache instead of being copied into SQLite's own cache.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA mmap_size={db_settings.SQLITE_MMAP_SIZE}")
+    cursor.close()
 
-if not db_settings.DEBUG:
-    sleep(30)
-for i in range(db_settings.DB_CONNECT_ATTEMPTS):
-    try:
-        engine = create_engine(
-            SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, pool_recycle=360
-        )
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        Base = declarative_base()
-        if isinstance(Base, DeclarativeMeta):
-            break
-    except Exception:
-        print(f"Unable to connect on attempt {i}")
-        sleep(10)
 
-if Base is None:
-    # Connect to localhost as a last ditch effort
-    SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace(
-        db_settings.MYSQL_HOST, "localhost"
-    )
+if db_settings.DB_BACKEND == "sqlite":
+    # immutable=1 skips file locking, the file is only ever replaced (not edited)
+    SQLITE_URI = f"file:{db_settings.SQLITE_PATH}?mode=ro&immutable=1&uri=true"
+    SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLITE_URI}"
+    ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{SQLITE_URI}"
+
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     Base = declarative_base()
+    async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+else:
+    SQLALCHEMY_DATABASE_URL = f"mariadb+mariadbconnector://{db_settings.MYSQL_USER}:{db_settings.MYSQL_PASSWORD}@{db_settings.MYSQL_HOST}:{db_settings.MYSQL_DB_PORT}/{db_settings.MYSQL_DATABASE}?charset=utf8mb4"
 
+    # Nothing connects (or resolves the host) until the first query,
+    # see wait_for_database
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, pool_recycle=360
+    )
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base = declarative_base()
 
-def get_database_session():
-    db = SessionLocal()
+    # Async engine used by the routes so queries don't block the event loop
+    ASYNC_SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace(
+        "mariadb+mariadbconnector", "mariadb+asyncmy", 1
+    )
+    async_engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, pool_recycle=360
+    )
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def database_available() -> bool:
+    """
+    Return whether the DB answers a trivial query (within DB_CONNECT_TIMEOUT).
+    """
     try:
+        async with async_engine.connect() as connection:
+            await wait_for(
+                connection.execute(text("SELECT 1")), db_settings.DB_CONNECT_TIMEOUT
+            )
+        return True
+    except Exception:
+        return False
+
+
+async def wait_for_database() -> bool:
+    """
+    Try to reach the DB up to DB_CONNECT_ATTEMPTS times, doubling the wait
+    between attempts from DB_CONNECT_BACKOFF up to DB_CONNECT_BACKOFF_MAX.
+    """
+    delay = db_settings.DB_CONNECT_BACKOFF
+    for attempt in range(db_settings.DB_CONNECT_ATTEMPTS):
+        if await database_available():
+            return True
+        if attempt < db_settings.DB_CONNECT_ATTEMPTS - 1:
+            print(f"Unable to connect on attempt {attempt}, retrying in {delay}s")
+            await sleep(delay)
+            delay = min(delay * 2, db_settings.DB_CONNECT_BACKOFF_MAX)
+    return False
+
+
+async def get_async_database_session():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
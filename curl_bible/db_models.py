@@ -56,3 +56,13 @@ class TableYLT(Base):
     chapter = Column(Integer())
     verse = Column(Integer())
     text = Column(String(255))
+
+
+# Version name (as passed in the 'version' option) to the table holding it.
+TRANSLATION_TABLES = {
+    "ASV": TableASV,
+    "BBE": TableBBE,
+    "KJV": TableKJV,
+    "WEB": TableWEB,
+    "YLT": TableYLT,
+}
@@ -0,0 +1,10 @@
+"""
+Gunicorn settings used by container-start.sh.
+"""
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Stop counting the gauges of a worker that exited (see curl_bible.metrics)
+    multiprocess.mark_process_dead(worker.pid)
@@ -67,7 +67,16 @@ Supports the following query types (GET):
     • curl bible.ricotta.dev/John:3:15-19
     • curl bible.ricotta.dev/John/3/15-19
     • curl "bible.ricotta.dev?book=John&chapter=3&verse=15-19"
-    • curl bible.ricotta.dev/John:3:15:John:4:15
+    • curl bible.ricotta.dev/John:3:15-4:15
+    • curl bible.ricotta.dev/Genesis:1:1:Exodus:2:3
+
+Many references can be fetched at once (POST):
+    • curl -X POST bible.ricotta.dev/batch -H "Content-Type: application/json" -d '{{"references": ["John:3:16", "Psalms/23"]}}'
+
+Verses can be searched by their words (GET):
+    • curl "bible.ricotta.dev/search?q=love+one+another&limit=5"
+    • curl "bible.ricotta.dev/search?q=%22in+the+beginning%22" (phrase)
+    • curl "bible.ricotta.dev/search?q=love+NEAR/3+neighbour" (at most 3 words apart)
 
 The following options are supported:
     • 'l' or 'length' - the number of lines present in the book
@@ -89,6 +98,15 @@ The following options are supported:
         Default value: ASV (American Standard Version)
         Tip: curl bible.ricotta.dev/versions to see all supported bible versions.
 
+    • 'versions' - compare several versions side by side, e.g. versions=ASV,KJV,WEB
+        Default value: none
+
+    • 's' or 'stream' - send the book one row at a time as it is rendered.
+        Default value: False
+
+    • 'p' or 'page' - show the given page of a passage too long for one book.
+        Default value: none (the passage is cut off with '...')
+
     These options can be combined on a single parameter for convenience:
         curl bible.ricotta.dev/John:3:15?options=l=50,w=85,c=False,v=BBE
     But may also be separated in key value pairs as parameters:
@@ -1,5 +1,7 @@
 import logging
 import time
+from collections import deque
+from threading import Condition, Thread
 from traceback import format_exception
 from typing import Optional
 
@@ -15,6 +17,12 @@ class InfluxDBSettings(BaseSettings):
     INFLUXDB_ORG: Optional[str] = ""
     INFLUXDB_URL: Optional[str] = ""
     INFLUXDB_BUCKET: Optional[str] = ""
+    # Points are written from a background thread, see InfluxDBBatchWriter
+    INFLUXDB_QUEUE_SIZE: int = 10000
+    INFLUXDB_BATCH_SIZE: int = 500
+    INFLUXDB_FLUSH_INTERVAL: float = 1.0
+    # "oldest" or "newest": which point is dropped when the queue is full
+    INFLUXDB_DROP_POLICY: str = "oldest"
 
     SettingsConfigDict(env_file=".env")
 
@@ -22,6 +30,8 @@ class InfluxDBSettings(BaseSettings):
 class InfluxDBWriter:
     def __init__(self):
         self.settings = InfluxDBSettings()
+        if not self.settings.INFLUXDB_URL:
+            raise ValueError("INFLUXDB_URL is not set")
         self.writer = influxdb_client.InfluxDBClient(
             url=self.settings.INFLUXDB_URL,
             token=self.settings.INFLUXDB_TOKEN,
@@ -30,7 +40,10 @@ class InfluxDBWriter:
         self.writer_cursor = self.writer.write_api(write_options=SYNCHRONOUS)
         self.bucket = self.settings.INFLUXDB_BUCKET
 
-    def log(self, value):
+    def point(self, value) -> Point:
+        """
+        Turn a log record into the point written to InfluxDB.
+        """
         data = (
             Point("log")
             .tag("filename", value.filename)
@@ -46,7 +59,7 @@ class InfluxDBWriter:
             if hasattr(value, "status_code"):
                 data.field("status_code", value.status_code)
         elif (
-            hasattr(value.msg, "len")
+            hasattr(value.msg, "__len__")
             and len(value.msg) == 2
             and isinstance(value.msg[0], _StreamingResponse)
             and isinstance(value.msg[-1], _CachedRequest)
@@ -59,19 +72,151 @@ class InfluxDBWriter:
 
             data.field("status_code", response.status_code)
             data.tag("message", message)
+        else:
+            # A point needs at least one field to be written
+            data.field("message", value.getMessage())
+
+        # Per-stage durations in ms (with SERVER_TIMING_ENABLED)
+        for stage, duration in getattr(value, "timings", {}).items():
+            data.field(f"{stage}_ms", duration)
+        return data
 
+    def write(self, points) -> None:
         self.writer_cursor.write(
-            bucket=self.bucket, org=self.settings.INFLUXDB_ORG, record=data
+            bucket=self.bucket, org=self.settings.INFLUXDB_ORG, record=points
         )
 
+    def log(self, value):
+        self.write(self.point(value))
+
+
+class InfluxDBBatchWriter:
+    """
+    Hands points to 'write' from a background thread, so logging never waits
+    on InfluxDB.
+
+    Points wait in a bounded queue and are written in batches of up to
+    'batch_size', at least every 'flush_interval' seconds. When 'max_queue'
+    points are already waiting, the oldest one is dropped to make room (or
+    the new one, with drop_policy="newest"). Points lost to a full queue are
+    counted in 'dropped', points lost to a failed write in 'failed'.
+    """
+
+    def __init__(
+        self,
+        write,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        drop_policy: str = "oldest",
+    ) -> None:
+        if drop_policy not in ("oldest", "newest"):
+            raise ValueError(f"Unknown drop policy {drop_policy!r}")
+        self.write = write
+        self.max_queue = max(max_queue, 1)
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.queue = deque()
+        self.condition = Condition()
+        self.closed = False
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.thread = Thread(target=self.run, name="influxdb-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, point) -> bool:
+        """
+        Queue a point without blocking.
+        Returns:
+            (bool): False if the point was dropped.
+        """
+        with self.condition:
+            if self.closed:
+                self.dropped += 1
+                return False
+            if len(self.queue) >= self.max_queue:
+                self.dropped += 1
+                if self.drop_policy == "newest":
+                    return False
+                self.queue.popleft()
+            self.queue.append(point)
+            if len(self.queue) >= self.batch_size:
+                self.condition.notify()
+        return True
+
+    def next_batch(self) -> list:
+        """
+        Wait for a full batch (or 'flush_interval'), then take it off the queue.
+        """
+        with self.condition:
+            deadline = time.monotonic() + self.flush_interval
+            while len(self.queue) < self.batch_size and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            count = min(len(self.queue), self.batch_size)
+            return [self.queue.popleft() for _ in range(count)]
+
+    def run(self) -> None:
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                if self.closed:
+                    return
+                continue
+            try:
+                self.write(batch)
+                self.flushed += len(batch)
+            except Exception:
+                # Nothing is logged here: the record would come straight back
+                self.failed += len(batch)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Write whatever is still queued and stop the thread.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self.queue),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
 
 class InfluxDBHTTPHandler(logging.Handler):
     def __init__(self):
         self.rest = InfluxDBWriter()
+        settings = self.rest.settings
+        self.batcher = InfluxDBBatchWriter(
+            self.rest.write,
+            max_queue=settings.INFLUXDB_QUEUE_SIZE,
+            batch_size=settings.INFLUXDB_BATCH_SIZE,
+            flush_interval=settings.INFLUXDB_FLUSH_INTERVAL,
+            drop_policy=settings.INFLUXDB_DROP_POLICY,
+        )
         super().__init__()
 
     def emit(self, record):
-        self.rest.log(record)
+        # Anything the InfluxDB client logs while writing would loop back here
+        if record.thread == self.batcher.thread.ident:
+            return
+        try:
+            self.batcher.put(self.rest.point(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.batcher.close()
+        super().close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+"""
+Prometheus metrics served on /metrics.
+
+Under gunicorn every worker is its own process: with PROMETHEUS_MULTIPROC_DIR
+set (see container-start.sh) each worker writes its values to memory mapped
+files in that directory, and /metrics adds up the files of every worker.
+Without it, the values of the current process are served.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+# Routes are labelled with their path template ('/{query}'), anything that
+# didn't match a route is counted under this label
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter(
+    "curl_bible_requests_total",
+    "Requests handled, by route and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "curl_bible_request_duration_seconds",
+    "Time until the response starts, by route.",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    "curl_bible_response_size_bytes",
+    "Size of the rendered responses (streamed responses aren't counted).",
+    ["route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+CACHE_LOOKUPS = Counter(
+    "curl_bible_response_cache_lookups_total",
+    "Lookups in the rendered response cache, by result (hit or miss).",
+    ["result"],
+)
+CACHE_BYTES = Gauge(
+    "curl_bible_response_cache_bytes",
+    "Size of the rendered response caches of every live worker.",
+    multiprocess_mode="livesum",
+)
+DB_CONNECTIONS = Gauge(
+    "curl_bible_db_connections",
+    "Open DB connections in the pools of every live worker.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_CONNECTIONS_IN_USE = Gauge(
+    "curl_bible_db_connections_in_use",
+    "DB connections checked out of the pools of every live worker.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+
+
+def route_label(request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+def observe_request(request, response, duration: float) -> None:
+    route = route_label(request)
+    REQUESTS.labels(request.method, route, response.status_code).inc()
+    REQUEST_DURATION.labels(request.method, route).observe(duration)
+    length = response.headers.get("content-length")
+    if length is not None:
+        RESPONSE_SIZE.labels(route).observe(int(length))
+
+
+def observe_cache_lookup(hit: bool) -> None:
+    CACHE_LOOKUPS.labels("hit" if hit else "miss").inc()
+
+
+def observe_cache_size(size: int) -> None:
+    CACHE_BYTES.set(size)
+
+
+def track_pool(engine, name: str) -> None:
+    """
+    Keep the DB connection gauges up to date from the pool events of 'engine'.
+    """
+    connections = DB_CONNECTIONS.labels(name)
+    in_use = DB_CONNECTIONS_IN_USE.labels(name)
+    event.listen(engine, "connect", lambda *args: connections.inc())
+    event.listen(engine, "close", lambda *args: connections.dec())
+    event.listen(engine, "close_detached", lambda *args: connections.dec())
+    event.listen(engine, "checkout", lambda *args: in_use.inc())
+    event.listen(engine, "checkin", lambda *args: in_use.dec())
+
+
+def latest_metrics() -> tuple:
+    """
+    Returns:
+        (tuple): The metrics of every worker in the Prometheus text format,
+            and its content type.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
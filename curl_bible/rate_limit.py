@@ -0,0 +1,252 @@
+"""
+Rate limit storage shared by every worker process of the host (see
+SharedMemoryStorage), and the addresses exempt from the limits.
+
+The limits are counted in fixed windows (slowapi's default strategy, and the
+one the 'limits' storages are built for) rather than with a token bucket: a
+client gets RATE_LIMIT hits per window, each a single counter increment.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import time
+from hashlib import blake2b
+from ipaddress import ip_address, ip_network
+from threading import Lock
+
+from limits.storage import Storage
+
+# Rate limit table layout (all integers are unsigned and little endian):
+#   header  magic, format version, number of slots
+#   slots   key hash (0 for an empty slot), expiry (unix time), hit count
+# A key lives in one of the SHARED_MEMORY_PROBES slots after hash % slots.
+SHARED_MEMORY_MAGIC = b"CBLIMITS"
+SHARED_MEMORY_FORMAT_VERSION = 1
+SHARED_MEMORY_HEADER = struct.Struct("<8sII")
+SHARED_MEMORY_SLOT = struct.Struct("<QdI4x")
+SHARED_MEMORY_PROBES = 8
+
+
+def default_shared_memory_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "curl_bible_rate_limit")
+
+
+class SharedMemoryStorage(Storage):
+    """
+    Rate limit counters kept in a memory mapped file, so every worker process
+    on the host counts against the same limits:
+
+        Limiter(storage_uri="shm:///dev/shm/curl_bible_rate_limit")
+
+    Each key is hashed to a fixed size slot holding its count and the end of
+    its window, so a hit costs a hash, a byte range lock (fcntl, shared by
+    the processes) on a few slots and a couple of struct reads/writes. When
+    every slot a key can use holds a live window, the one ending first is
+    reused: with enough 'slots' for the number of active clients this
+    doesn't happen.
+    """
+
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(
+        self, uri: str = None, wrap_exceptions: bool = False, slots: int = 65536
+    ) -> None:
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+        path = (uri or "").partition("://")[2] or default_shared_memory_path()
+        self.slots = int(slots)
+        self.size = SHARED_MEMORY_HEADER.size + SHARED_MEMORY_SLOT.size * (
+            self.slots + SHARED_MEMORY_PROBES
+        )
+        # fcntl locks are held by the process, this one is for its threads
+        self.lock = Lock()
+        self.fd = self.open_table(path)
+        self.table = mmap.mmap(self.fd, self.size)
+
+    def open_table(self, path: str) -> int:
+        """
+        Open the table at 'path', creating it if needed.
+        A table of another layout (an older version, another number of slots)
+        may still be mapped by running workers, so it is never resized in
+        place: a new table is moved over it instead, and the workers that
+        mapped the old one keep counting in it until they restart.
+        Returns:
+            (int): The file descriptor of the table.
+        """
+        expected = SHARED_MEMORY_HEADER.pack(
+            SHARED_MEMORY_MAGIC, SHARED_MEMORY_FORMAT_VERSION, self.slots
+        )
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                size = os.fstat(fd).st_size
+                header = os.pread(fd, SHARED_MEMORY_HEADER.size, 0)
+                if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                    # Replaced by another worker while waiting for the lock
+                    pass
+                elif header == expected and size == self.size:
+                    return fd
+                elif size == 0:
+                    # Just created, nothing maps it yet
+                    os.ftruncate(fd, self.size)
+                    os.pwrite(fd, expected, 0)
+                    return fd
+                else:
+                    self.replace_table(path, expected)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def replace_table(self, path: str, header: bytes) -> None:
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(temporary_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, header, 0)
+        finally:
+            os.close(fd)
+        os.replace(temporary_path, path)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def key_hash(self, key: str) -> int:
+        # 0 marks an empty slot
+        digest = blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def offset(self, slot: int) -> int:
+        return SHARED_MEMORY_HEADER.size + slot * SHARED_MEMORY_SLOT.size
+
+    def locked(self, key_hash: int):
+        """
+        Lock the slots 'key_hash' can use.
+        Returns:
+            (SlotLock): Context manager giving the first slot of the range.
+        """
+        return SlotLock(self, key_hash % self.slots)
+
+    def find(self, first: int, key_hash: int, now: float) -> tuple:
+        """
+        Return the slot holding the live window of 'key_hash' and its
+        (hash, expiry, count), or the slot to use for a new window.
+        """
+        reusable = None
+        for slot in range(first, first + SHARED_MEMORY_PROBES):
+            entry = SHARED_MEMORY_SLOT.unpack_from(self.table, self.offset(slot))
+            if entry[0] == key_hash and entry[1] > now:
+                return slot, entry
+            if reusable is None or entry[1] < reusable[1][1]:
+                reusable = (slot, entry)
+        return reusable[0], (0, 0.0, 0)
+
+    def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        key_hash = self.key_hash(key)
+        with self.locked(key_hash) as first:
+            now = time.time()
+            slot, (_, expires, count) = self.find(first, key_hash, now)
+            if count == 0 or elastic_expiry:
+                expires = now + expiry
+            count += amount
+            SHARED_MEMORY_SLOT.pack_into(
+                self.table, self.offset(slot), key_hash, expires, count
+            )
+        return count
+
+    def get(self, key: str) -> int:
+        key_hash = self.key_hash(key)
+        with self.locked(key_hash) as first:
+            return self.find(first, key_hash, time.time())[1][2]
+
+    def get_expiry(self, key: str) -> float:
+        key_hash = self.key_hash(key)
+        now = time.time()
+        with self.locked(key_hash) as first:
+            _, (_, expires, count) = self.find(first, key_hash, now)
+        return expires if count else now
+
+    def check(self) -> bool:
+        return not self.table.closed
+
+    def reset(self) -> int:
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                cleared = 0
+                for slot in range(self.slots + SHARED_MEMORY_PROBES):
+                    entry = SHARED_MEMORY_SLOT.unpack_from(
+                        self.table, self.offset(slot)
+                    )
+                    cleared += entry[0] != 0 and entry[1] > now
+                data_start = self.offset(0)
+                self.table[data_start:] = bytes(self.size - data_start)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        return cleared
+
+    def clear(self, key: str) -> None:
+        key_hash = self.key_hash(key)
+        with self.locked(key_hash) as first:
+            slot, (found, _, _) = self.find(first, key_hash, time.time())
+            if found == key_hash:
+                SHARED_MEMORY_SLOT.pack_into(self.table, self.offset(slot), 0, 0.0, 0)
+
+
+class SlotLock:
+    __slots__ = ("storage", "first")
+
+    def __init__(self, storage: SharedMemoryStorage, first: int) -> None:
+        self.storage = storage
+        self.first = first
+
+    def __enter__(self) -> int:
+        storage = self.storage
+        storage.lock.acquire()
+        fcntl.lockf(
+            storage.fd,
+            fcntl.LOCK_EX,
+            SHARED_MEMORY_SLOT.size * SHARED_MEMORY_PROBES,
+            storage.offset(self.first),
+        )
+        return self.first
+
+    def __exit__(self, *exc_info) -> None:
+        storage = self.storage
+        fcntl.lockf(
+            storage.fd,
+            fcntl.LOCK_UN,
+            SHARED_MEMORY_SLOT.size * SHARED_MEMORY_PROBES,
+            storage.offset(self.first),
+        )
+        storage.lock.release()
+
+
+def exempt_addresses(addresses: str):
+    """
+    Build the 'exempt_when' check of the rate limits from a comma separated
+    list of client addresses and networks ('10.0.0.5, 192.168.0.0/24').
+    """
+    networks = tuple(
+        ip_network(address.strip(), strict=False)
+        for address in addresses.split(",")
+        if address.strip()
+    )
+
+    def is_exempt(request) -> bool:
+        if not networks or request.client is None:
+            return False
+        try:
+            client = ip_address(request.client.host)
+        except ValueError:
+            return False
+        return any(client in network for network in networks)
+
+    return is_exempt
@@ -0,0 +1,343 @@
+import re
+from array import array
+from bisect import bisect_left
+from heapq import nlargest
+from itertools import accumulate
+from math import log
+from threading import Lock
+
+# Words are runs of letters and digits ("LORD's" is "lord" and "s")
+TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+# '"in the beginning"' and 'love NEAR/3 neighbour'
+PHRASE_REGEX = re.compile(r'"([^"]*)"')
+NEAR_REGEX = re.compile(r"(\S+)\s+NEAR/(\d{1,3})\s+(\S+)")
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_REGEX.findall(text.lower())
+
+
+def parse_query(query: str) -> tuple:
+    """
+    Split a search query into its words and the phrases and proximities
+    the verses must contain:
+        'love NEAR/3 neighbour "thy God" mercy' ->
+            ['love', 'neighbour', 'thy', 'god', 'mercy'],
+            [('phrase', ['thy', 'god']), ('near', 'love', 'neighbour', 3)]
+    Returns:
+        (tuple): Every word (to rank the verses with) and the constraints.
+    """
+    constraints = []
+    for phrase in PHRASE_REGEX.findall(query):
+        tokens = tokenize(phrase)
+        if len(tokens) > 1:
+            constraints.append(("phrase", tokens))
+    rest = PHRASE_REGEX.sub(" ", query)
+
+    for first, distance, second in NEAR_REGEX.findall(rest):
+        first, second = tokenize(first), tokenize(second)
+        if first and second:
+            constraints.append(("near", first[-1], second[0], int(distance)))
+    rest = NEAR_REGEX.sub(r"\1 \3", rest)
+
+    words = []
+    for phrase in PHRASE_REGEX.findall(query):
+        words.extend(tokenize(phrase))
+    words.extend(tokenize(rest))
+    return words, constraints
+
+
+class Posting:
+    """
+    Where a word appears in a translation: the rows it appears in (sorted)
+    and, for every row, its positions in the verse. The positions of
+    rows[i] are positions[starts[i]:starts[i + 1]], each stored as the
+    distance from the previous one (delta encoded).
+    """
+
+    __slots__ = ("rows", "starts", "positions")
+
+    def __init__(self) -> None:
+        self.rows = array("I")
+        self.starts = array("I", [0])
+        self.positions = array("H")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, row: int, positions: list) -> None:
+        previous = 0
+        for position in positions:
+            self.positions.append(position - previous)
+            previous = position
+        self.rows.append(row)
+        self.starts.append(len(self.positions))
+
+    def frequency(self, entry: int) -> int:
+        return self.starts[entry + 1] - self.starts[entry]
+
+    def entry(self, row: int, low: int = 0) -> int:
+        """
+        Return the index of 'row' in the posting (searching from 'low'),
+        or -1 if the word isn't in that row.
+        """
+        entry = bisect_left(self.rows, row, low)
+        if entry < len(self.rows) and self.rows[entry] == row:
+            return entry
+        return -1
+
+    def entry_positions(self, entry: int) -> list:
+        start, end = self.starts[entry], self.starts[entry + 1]
+        return list(accumulate(self.positions[start:end]))
+
+    def nbytes(self) -> int:
+        return sum(
+            column.itemsize * len(column)
+            for column in (self.rows, self.starts, self.positions)
+        )
+
+
+def intersect(postings: list) -> list:
+    """
+    Return the rows every posting has, along with the entry of the row in
+    each posting. Walks the shortest posting and looks the rows up in the
+    others, so common words cost a binary search per candidate row.
+    """
+    order = sorted(range(len(postings)), key=lambda index: len(postings[index]))
+    shortest = postings[order[0]]
+    lows = [0] * len(postings)
+    matches = []
+    for entry, row in enumerate(shortest.rows):
+        entries = [0] * len(postings)
+        entries[order[0]] = entry
+        for index in order[1:]:
+            found = postings[index].entry(row, lows[index])
+            if found < 0:
+                break
+            entries[index] = lows[index] = found
+        else:
+            matches.append((row, entries))
+    return matches
+
+
+def within(first: list, second: list, distance: int) -> bool:
+    """
+    Return whether a position of 'first' is at most 'distance' words from a
+    position of 'second' (both sorted).
+    """
+    i = j = 0
+    while i < len(first) and j < len(second):
+        if abs(first[i] - second[j]) <= distance:
+            return True
+        if first[i] < second[j]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+class TranslationIndex:
+    """
+    Positional inverted index of every verse of one translation, ranked
+    with BM25.
+
+    Row i is the verse with id ids[i], lengths[i] words long. Every word
+    maps to its Posting, so phrases and proximities are answered by
+    intersecting postings and comparing positions, never by reading the text.
+    """
+
+    __slots__ = ("ids", "lengths", "average_length", "postings")
+
+    def __init__(self, rows) -> None:
+        """
+        Build the index from (verse id, text) rows.
+        """
+        self.ids = array("I")
+        self.lengths = array("H")
+        self.postings = {}
+
+        for row, (verse, text) in enumerate(rows):
+            tokens = tokenize(text)[:0xFFFF]
+            self.ids.append(verse)
+            self.lengths.append(len(tokens))
+            positions = {}
+            for position, token in enumerate(tokens):
+                positions.setdefault(token, []).append(position)
+            for token, token_positions in positions.items():
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = Posting()
+                posting.add(row, token_positions)
+
+        self.average_length = sum(self.lengths) / max(len(self.ids), 1) or 1.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def phrase_rows(self, tokens: list) -> set:
+        """
+        Return the rows holding every token, one right after the other.
+        """
+        postings = [self.postings.get(token) for token in tokens]
+        if None in postings:
+            return set()
+        rows = set()
+        for row, entries in intersect(postings):
+            starts = postings[0].entry_positions(entries[0])
+            for offset in range(1, len(postings)):
+                following = set(postings[offset].entry_positions(entries[offset]))
+                starts = [start for start in starts if start + offset in following]
+                if not starts:
+                    break
+            else:
+                rows.add(row)
+        return rows
+
+    def near_rows(self, first: str, second: str, distance: int) -> set:
+        """
+        Return the rows where 'first' is at most 'distance' words from 'second'.
+        """
+        postings = [self.postings.get(first), self.postings.get(second)]
+        if None in postings:
+            return set()
+        if first == second:
+            # Two occurrences of the same word
+            posting = postings[0]
+            rows = set()
+            for entry, row in enumerate(posting.rows):
+                positions = posting.entry_positions(entry)
+                gaps = (b - a for a, b in zip(positions, positions[1:]))
+                if any(gap <= distance for gap in gaps):
+                    rows.add(row)
+            return rows
+        return {
+            row
+            for row, entries in intersect(postings)
+            if within(
+                postings[0].entry_positions(entries[0]),
+                postings[1].entry_positions(entries[1]),
+                distance,
+            )
+        }
+
+    def search(self, query: str, limit: int) -> list:
+        """
+        Return the (verse id, score) of the 'limit' verses best matching
+        'query', best first. A verse matches any of the words, and scores
+        higher the more (and rarer) words it contains. Quoted phrases
+        ('"in the beginning"') and proximities ('love NEAR/3 neighbour',
+        at most 3 words apart) must all be found in the verse.
+        """
+        words, constraints = parse_query(query)
+        allowed = None
+        for constraint in constraints:
+            if constraint[0] == "phrase":
+                rows = self.phrase_rows(constraint[1])
+            else:
+                rows = self.near_rows(*constraint[1:])
+            allowed = rows if allowed is None else allowed & rows
+            if not allowed:
+                return []
+
+        verses = len(self.ids)
+        scores = {}
+        for token in set(words):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            idf = log(1 + (verses - len(posting) + 0.5) / (len(posting) + 0.5))
+            if allowed is None:
+                entries = enumerate(posting.rows)
+            else:
+                entries = (
+                    (entry, row)
+                    for row, entry in ((row, posting.entry(row)) for row in allowed)
+                    if entry >= 0
+                )
+            for entry, row in entries:
+                frequency = posting.frequency(entry)
+                norm = BM25_K1 * (
+                    1 - BM25_B + BM25_B * self.lengths[row] / self.average_length
+                )
+                score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                scores[row] = scores.get(row, 0.0) + score
+
+        # Ties go to the earliest verse
+        best = nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.ids[row], score) for row, score in best]
+
+    def nbytes(self) -> int:
+        return (
+            self.ids.itemsize * len(self.ids)
+            + self.lengths.itemsize * len(self.lengths)
+            + sum(posting.nbytes() for posting in self.postings.values())
+        )
+
+
+class SearchIndex:
+    """
+    Full text search over every translation (see TranslationIndex), built
+    once at startup from the corpus or the DB (see SEARCH_ENABLED).
+    """
+
+    def __init__(self) -> None:
+        self.translations = {}
+        self.lock = Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return len(self.translations) > 0
+
+    def has_translation(self, version: str) -> bool:
+        return version in self.translations
+
+    def add_translation(self, version: str, rows) -> TranslationIndex:
+        """
+        Index a translation from an iterable of (verse id, text) rows.
+        """
+        translation = TranslationIndex(rows)
+        with self.lock:
+            self.translations = dict(self.translations, **{version: translation})
+        return translation
+
+    def load_corpus(self, corpus) -> None:
+        """
+        Index every translation of a VerseCorpus.
+        """
+        for version, translation in corpus.translations.items():
+            self.add_translation(
+                version,
+                (
+                    (translation.ids[index], translation.row(index).text)
+                    for index in range(len(translation))
+                ),
+            )
+
+    def load(self, db, tables: dict) -> None:
+        """
+        Index every translation in 'tables' (version name -> ORM class) from the DB.
+        """
+        for version, table in tables.items():
+            self.add_translation(
+                version, db.query(table.id, table.text).order_by(table.id)
+            )
+
+    def clear(self) -> None:
+        self.translations = {}
+
+    def nbytes(self) -> int:
+        return sum(translation.nbytes() for translation in self.translations.values())
+
+    def search(self, version: str, query: str, limit: int) -> list:
+        """
+        Raises:
+            KeyError: the version is not indexed.
+        """
+        return self.translations[version].search(query, limit)
+
+
+search_index = SearchIndex()
@@ -1,46 +1,112 @@
 import logging
+from asyncio import create_task, gather, sleep
 from random import choice, randint
+from textwrap import shorten
+from time import perf_counter
 from typing import Union
 
 from fastapi import Depends, FastAPI, Query, Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.openapi.docs import (
     get_redoc_html,
     get_swagger_ui_html,
     get_swagger_ui_oauth2_redirect_html,
 )
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
+from curl_bible.books import book_index, verse_bounds
+from curl_bible.cache import ResponseCache, etag_matches, make_etag
 from curl_bible.config import (
+    BatchReference,
+    BatchRequest,
+    BookPages,
     Options,
+    ParallelPages,
+    Reference,
+    UserError,
     __version__,
+    apply_docs_referer,
+    async_batch_query,
+    async_create_request_verse,
+    async_flatten_args,
+    async_multi_query,
+    async_parallel_query,
+    async_verses_by_id,
+    check_bounds,
+    check_range_size,
     create_book,
-    create_request_verse,
+    create_book_rows,
+    create_parallel_book,
     create_settings,
-    flatten_args,
-    multi_query,
+    format_verses,
+    interleave_verses,
+    options_openapi,
+    parse_reference,
+    query_reference,
+    request_options,
+    requested_versions,
+)
+from curl_bible.corpus import corpus, verse_id
+from curl_bible.database import (
+    AsyncSessionLocal,
+    SessionLocal,
+    async_engine,
+    database_available,
+    db_settings,
+    engine,
+    get_async_database_session,
+    wait_for_database,
 )
-from curl_bible.database import engine, get_database_session
-from curl_bible.db_models import Base
+from curl_bible.db_models import TRANSLATION_TABLES, Base
 from curl_bible.helper_methods import router as helper_methods_router
 from curl_bible.influxdb import InfluxDBHTTPHandler
+from curl_bible.metrics import (
+    latest_metrics,
+    observe_cache_lookup,
+    observe_cache_size,
+    observe_request,
+    track_pool,
+)
+from curl_bible.rate_limit import exempt_addresses
+from curl_bible.search import search_index
+from curl_bible.timing import request_timings, start_timings, timed
 
-limiter = Limiter(key_func=get_remote_address)
 settings = create_settings()
+# Counted in shared memory (see SharedMemoryStorage) by every worker
+limiter = Limiter(
+    key_func=get_remote_address, storage_uri=settings.RATE_LIMIT_STORAGE_URI
+)
+rate_limit_exempt = exempt_addresses(settings.RATE_LIMIT_EXEMPT)
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES
+)
+# The options are parsed from the query string (see request_options)
+OPTIONS_OPENAPI = options_openapi()
 
 app = FastAPI(version=__version__, docs_url=None, redoc_url=None)
 app.mount("/static", StaticFiles(directory="curl_bible/static"), name="static")
 app.include_router(helper_methods_router)
 app.state.limiter = limiter
+app.state.database_ready = False
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+track_pool(engine, "sync")
+track_pool(async_engine.sync_engine, "async")
+
 # Fix issue with Pytest imports
 try:
     app.mount("/static", StaticFiles(directory="curl_bible/static"), name="static")
@@ -58,28 +124,192 @@ app.add_exception_handler(Exception, default_exceptions)
 
 @app.middleware("http")
 async def log_response(request: Request, call_next):
-    response = await call_next(request)
+    start = perf_counter()
+    extra = {}
+    if settings.SERVER_TIMING_ENABLED:
+        timings, token = start_timings()
+        try:
+            response = await call_next(request)
+        finally:
+            request_timings.reset(token)
+        # Time until the response starts, streamed bodies are sent after this
+        extra["timings"] = timings.durations()
+        response.headers["Server-Timing"] = timings.header(extra["timings"])
+    else:
+        response = await call_next(request)
+    observe_request(request, response, perf_counter() - start)
+
     if response.status_code == status.HTTP_200_OK:
-        logger.info([response, request])
+        logger.info([response, request], extra=extra)
     elif response.status_code == status.HTTP_400_BAD_REQUEST:
-        logger.warning([response, request])
+        logger.warning([response, request], extra=extra)
     elif response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR:
-        logger.error([response, request])
+        logger.error([response, request], extra=extra)
     return response
 
 
+async def connect_database():
+    """
+    Wait for the DB, then create the tables and load whatever still needs it
+    (the book names and the in-memory corpus). /readyz reports when it's done.
+    The DB may take minutes to start, so this keeps retrying (every
+    DB_CONNECT_BACKOFF_MAX seconds once wait_for_database gives up) until
+    it can be reached.
+    """
+    while not await wait_for_database():
+        logger.error(
+            f"Could not connect to the DB, retrying in {db_settings.DB_CONNECT_BACKOFF_MAX}s"
+        )
+        await sleep(db_settings.DB_CONNECT_BACKOFF_MAX)
+
+    # Initalize DB (the SQLite database is read-only and built ahead of time)
+    if db_settings.DB_BACKEND != "sqlite":
+        try:
+            async with async_engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+        except Exception as e:
+            logger.error(f"Could not initialize the DB with reason {repr(e)}")
+
+    # Load every translation into memory (if enabled)
+    if settings.CORPUS_ENABLED and not corpus.loaded:
+        try:
+            with SessionLocal() as db:
+                await run_in_threadpool(corpus.load, db, TRANSLATION_TABLES)
+            logger.info(f"Loaded verse corpus ({corpus.nbytes()} bytes)")
+        except Exception as e:
+            corpus.clear()
+            logger.error(f"Could not load verse corpus with reason {repr(e)}")
+
+    # Load the book name index
+    if not book_index.loaded:
+        try:
+            async with AsyncSessionLocal() as db:
+                await book_index.async_refresh(db)
+        except Exception as e:
+            logger.error(f"Could not load book names with reason {repr(e)}")
+
+    # Load the last verse of every chapter
+    if not verse_bounds.loaded:
+        try:
+            async with AsyncSessionLocal() as db:
+                await verse_bounds.async_refresh(db, TRANSLATION_TABLES)
+        except Exception as e:
+            verse_bounds.clear()
+            logger.error(f"Could not load verse bounds with reason {repr(e)}")
+
+    app.state.database_ready = True
+
+
+async def build_search_index():
+    """
+    Index every translation for /search, from the corpus (once the DB task is
+    done, as it may load it) or from the DB.
+    """
+    if not corpus.loaded:
+        await app.state.database_task
+    try:
+        if corpus.loaded:
+            await run_in_threadpool(search_index.load_corpus, corpus)
+        elif app.state.database_ready:
+            with SessionLocal() as db:
+                await run_in_threadpool(search_index.load, db, TRANSLATION_TABLES)
+        else:
+            return
+        logger.info(f"Built search index ({search_index.nbytes()} bytes)")
+    except Exception as e:
+        search_index.clear()
+        logger.error(f"Could not build the search index with reason {repr(e)}")
+
+
 @app.on_event("startup")
 async def startup_event():
-    # Initalize DB
-    Base.metadata.create_all(bind=engine)
+    # Map the corpus file (if set), with the book names stored in it
+    if settings.CORPUS_PATH:
+        try:
+            corpus.map_file(settings.CORPUS_PATH)
+            if corpus.metadata.get("abbreviations"):
+                book_index.build(corpus.metadata["abbreviations"])
+            if corpus.metadata.get("bounds"):
+                verse_bounds.build_metadata(corpus.metadata["bounds"])
+            logger.info(f"Mapped verse corpus {settings.CORPUS_PATH}")
+        except Exception as e:
+            corpus.clear()
+            logger.error(f"Could not map verse corpus with reason {repr(e)}")
 
     # Create InfluxDB (if it exists)
     try:
-        influx_http = InfluxDBHTTPHandler()
-        logger.addHandler(influx_http)
+        app.state.influx_http = InfluxDBHTTPHandler()
+        logger.addHandler(app.state.influx_http)
     except Exception as e:
         logger.error(f"Could not load InfluxDB with reason {repr(e)}")
 
+    # Connect to the DB without holding up startup
+    app.state.database_task = create_task(connect_database())
+    if settings.SEARCH_ENABLED:
+        app.state.search_task = create_task(build_search_index())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop waiting for a DB that never came up, and let the cancelled tasks
+    # hand their connections back before the event loop goes away
+    tasks = []
+    for name in ("database_task", "search_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+            tasks.append(task)
+    await gather(*tasks, return_exceptions=True)
+
+    # Send the log points that are still queued
+    influx_http = getattr(app.state, "influx_http", None)
+    if influx_http is not None:
+        logger.removeHandler(influx_http)
+        await run_in_threadpool(influx_http.close)
+
+
+@app.get("/healthz", include_in_schema=False)
+async def health_check():
+    """
+    Liveness probe: the server is up and handling requests.
+    """
+    return JSONResponse(content={"status": "ok"})
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness_check():
+    """
+    Readiness probe: verses can be served, either entirely from the corpus
+    (verses and book names) or from a reachable DB once startup is done.
+    """
+    corpus_ready = corpus.loaded and book_index.loaded
+    database_ready = app.state.database_ready
+    if database_ready and not corpus_ready:
+        database_ready = await database_available()
+    ready = corpus_ready or database_ready
+    return JSONResponse(
+        content={
+            "status": "ready" if ready else "starting",
+            "database": database_ready,
+            "corpus": corpus.loaded,
+            "book_names": book_index.loaded,
+            "search": search_index.loaded,
+        },
+        status_code=(
+            status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics of every worker (requests, latency and response size
+    by route, response cache lookups, DB connections).
+    """
+    content, media_type = latest_metrics()
+    return Response(content=content, headers={"Content-Type": media_type})
+
 
 @app.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
@@ -106,243 +336,426 @@ async def swagger_ui_redirect():
     return get_swagger_ui_oauth2_redirect_html()
 
 
-@app.get("/")
-@limiter.limit(settings.RATE_LIMIT)
-async def as_arguments_book_chapter_verse(
+async def verse_response(
+    db,
     request: Request,
-    book: Union[str | None] = Query(default=None),
-    chapter: Union[int, None] = Query(default=None, ge=0, le=50),
-    verse: Union[str, None] = Query(default=None, pattern=settings.VERSE_REGEX),
-    db_session: Session = Depends(get_database_session),
-    options: Options = Depends(),
+    options: Options,
+    reference: str | Reference,
+    random: bool = False,
 ):
-    kwargs = dict()
-    if book is None and chapter is None and verse is None:
-        book = choice(["Matthew", "Mark", "Luke", "John", "Rev"])
-        chapter = str(randint(1, 10))
-        verse = f"{randint(1,5)}-{randint(6,10)}"
-    if book is not None:
-        kwargs["book"] = book
-    if chapter is not None:
-        kwargs["chapter"] = chapter
-    if verse is not None:
-        if "-" in verse:
-            verse_start, verse_end = verse.split("-")
-            kwargs["verse_start"] = verse_start
-            kwargs["verse_end"] = verse_end
+    """
+    Look up, render and return the verses of 'reference' (any form of
+    parse_reference, or a Reference already built, see query_reference).
+    Every verse route delegates to this.
+
+    The response only depends on the text, the reference and the options, so
+    it has a strong ETag and clients and CDNs may reuse it (see
+    HTTP_CACHE_MAX_AGE). A request whose If-None-Match holds the ETag is
+    answered with a 304 once the books are found, before any verse is
+    queried or rendered. A 'random' passage and the text returned to the
+    interactive docs are not stored.
+    """
+    if isinstance(reference, Reference):
+        parsed = reference
+    else:
+        parsed = parse_reference(reference)
+    if parsed is None:
+        raise UserError(f"Reference {reference} not understood.")
+    with timed("reference"):
+        request_verse = await async_create_request_verse(db=db, **parsed.arguments())
+    docs_options = apply_docs_referer(options, request)
+    if random or docs_options is not options:
+        headers = {"Cache-Control": "no-store"}
+    else:
+        # The text only changes with the corpus file, or the DB with a release
+        text_version = corpus.metadata.get("checksum") or __version__
+        headers = {
+            "ETag": make_etag(text_version, parsed, options),
+            "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE}",
+        }
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response = await render_verses(db, request, docs_options, parsed, request_verse)
+    response.headers.update(headers)
+    return response
+
+
+async def render_verses(
+    db, request: Request, options: Options, reference: Reference, request_verse: str
+):
+    """
+    Look up, render and return the verses of 'reference' (formatted as
+    'request_verse'), in one version or side by side in several (see the
+    'versions' option). Rendered responses are cached, keyed by the formatted
+    reference and the options.
+    """
+    kwargs = reference.arguments()
+    versions = requested_versions(options)
+    cache_key = (request_verse, options)
+    cached = response_cache.get(cache_key)
+    observe_cache_lookup(cached is not None)
+    if cached is not None:
+        media_type, body = cached
+        return Response(content=body, media_type=media_type)
+
+    with timed("books"):
+        arguments = await async_flatten_args(
+            db=db, options=options, request=request, **kwargs
+        )
+        for version in versions or [options.version.upper()]:
+            check_bounds(version, arguments)
+    if versions:
+        with timed("query"):
+            verses = await async_parallel_query(db, versions, **arguments)
+        with timed("render"):
+            response = parallel_response(options, request_verse, arguments, verses)
+        if not isinstance(response, StreamingResponse):
+            cache_response(cache_key, response)
+        return response
+
+    with timed("query"):
+        kwargs.update(await async_multi_query(db, **arguments))
+
+    if options.page is not None:
+        pages = BookPages(kwargs.get("text"), options, request_verse)
+        if not pages.has_page(options.page):
+            raise UserError(f"Page {options.page} not found.")
+        if options.return_json or options.text_only:
+            kwargs["text"] = pages.text(options.page)
+        kwargs["page"] = options.page
+        kwargs["next_page"] = pages.next_page(options.page)
+
+    if options.stream and not options.return_json and not options.text_only:
+        # Send each row of the book as soon as it is rendered (not cached)
+        return StreamingResponse(
+            create_book_rows(
+                bible_verse=kwargs.get("text"),
+                user_options=options,
+                request_verse=request_verse,
+            ),
+            media_type="text/plain; charset=utf-8",
+        )
+
+    with timed("render"):
+        if options.return_json:
+            kwargs["request_verse"] = request_verse
+            kwargs["options"] = options.to_json()
+            response = JSONResponse(content=jsonable_encoder(kwargs))
+        elif options.text_only:
+            response = PlainTextResponse(content=kwargs.get("text"))
         else:
-            kwargs["verse"] = verse
+            result = create_book(
+                bible_verse=kwargs.get("text"),
+                user_options=options,
+                request_verse=request_verse,
+            )
+            response = PlainTextResponse(content=result)
+
+    cache_response(cache_key, response)
+    return response
+
+
+def cache_response(cache_key: tuple, response) -> None:
+    response_cache.set(
+        cache_key, (response.media_type, response.body), len(response.body)
+    )
+    observe_cache_size(response_cache.size)
 
-    request_verse = create_request_verse(db=db_session, **kwargs)
-    kwargs["request"] = request
-    arguments = flatten_args(db=db_session, options=options, **kwargs)
 
-    kwargs.update(multi_query(db_session, **arguments))
+def parallel_response(options: Options, request_verse: str, arguments: dict, verses):
+    """
+    Render the verses of several versions ('verses' being the verses of each
+    version): side by side in the book, interleaved verse by verse as text,
+    or keyed by version in JSON.
+    """
+    texts = {
+        version: format_verses(rows, options, {})["text"]
+        for version, rows in verses.items()
+    }
+    if options.page is not None:
+        pages = ParallelPages(texts, options, request_verse)
+        if not pages.has_page(options.page):
+            raise UserError(f"Page {options.page} not found.")
 
     if options.return_json:
-        kwargs["request_verse"] = request_verse
-        if "request" in kwargs:
-            # The FastAPI "Request" can't be converted to JSON.
-            kwargs.pop("request")
-        if "options" in kwargs:
-            kwargs.get("options").request = None
-        return kwargs
+        content = {
+            key: value
+            for key, value in arguments.items()
+            if key not in ("options", "request")
+        }
+        if options.page is not None:
+            texts = pages.text(options.page)
+            content["page"] = options.page
+            content["next_page"] = pages.next_page(options.page)
+        content.update(
+            request_verse=request_verse, texts=texts, options=options.to_json()
+        )
+        return JSONResponse(content=jsonable_encoder(content))
     if options.text_only:
-        return PlainTextResponse(content=kwargs.get("text"))
-    result = create_book(
-        bible_verse=kwargs.get("text"),
-        user_options=options,
-        request_verse=request_verse,
+        return PlainTextResponse(content=interleave_verses(verses))
+    if options.stream:
+        # Send each row of the book as soon as it is rendered (not cached)
+        pages = ParallelPages(texts, options, request_verse)
+        return StreamingResponse(
+            pages.rows(options.page or 1), media_type="text/plain; charset=utf-8"
+        )
+    return PlainTextResponse(
+        content=create_parallel_book(
+            texts=texts, user_options=options, request_verse=request_verse
+        )
     )
-    return PlainTextResponse(content=result)
 
 
-@app.get("/{query}")
-@limiter.limit(settings.RATE_LIMIT)
-async def query_many(
+@app.post("/batch", openapi_extra=OPTIONS_OPENAPI)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
+async def batch_lookup(
     request: Request,
-    query: str,
-    db: Session = Depends(get_database_session),
-    options: Options = Depends(),
+    batch: BatchRequest,
+    db: AsyncSession = Depends(get_async_database_session),
+    options: Options = Depends(request_options),
 ):
-    kwargs = dict()
-    split_query = query.split(":")
-    if len(split_query) == 2:
-        kwargs["book"] = split_query[0]
-        kwargs["chapter"] = split_query[1]
-    elif len(split_query) == 3:
-        kwargs["book"] = split_query[0]
-        kwargs["chapter"] = split_query[1]
-        if "-" in split_query[2]:
-            verse_start, verse_end = split_query[2].split("-")
-            kwargs["verse_start"] = verse_start
-            kwargs["verse_end"] = verse_end
-        else:
-            kwargs["verse"] = split_query[2]
+    """
+    Look up many references ('John:3:16', 'Gen/1/1-3'...) in one request.
+    The verses are fetched with one query per version, and each reference is
+    returned as JSON, text or a book depending on the options (stream and page
+    are not supported). A reference that can't be found is reported in place
+    instead of failing the whole batch.
+    """
+    if len(batch.references) > settings.BATCH_MAX_REFERENCES:
+        raise UserError(
+            f"Too many references! At most {settings.BATCH_MAX_REFERENCES} are allowed."
+        )
+    options = apply_docs_referer(options, request)
+
+    results = []
+    # (version, flattened arguments) and result of every reference found
+    items = []
+    found = []
+    for item in batch.references:
+        if not isinstance(item, BatchReference):
+            item = BatchReference(reference=item)
+        version = (item.version or options.version).upper()
+        result = {"reference": item.reference, "version": version}
+        results.append(result)
+        try:
+            reference = parse_reference(item.reference)
+            if reference is None:
+                raise UserError(f"Reference {item.reference} not understood.")
+            arguments = reference.arguments()
+            if version not in TRANSLATION_TABLES:
+                raise UserError(f"Version {version} not found.")
+            with timed("reference"):
+                result["request_verse"] = await async_create_request_verse(
+                    db=db, **arguments
+                )
+            with timed("books"):
+                arguments = await async_flatten_args(db=db, **arguments)
+                check_bounds(version, arguments)
+            items.append((version, arguments))
+            found.append(result)
+        except UserError as e:
+            result["error"] = e.detail
+
+    with timed("query"):
+        verses = await async_batch_query(db, items)
+    # A reference without verses, or covering too many, is reported in place too
+    fetched = []
+    for result, data in zip(found, verses):
+        try:
+            if not data:
+                raise UserError(f"No verses found for {result['request_verse']}.")
+            check_range_size(len(data))
+            fetched.append((result, data))
+        except UserError as e:
+            result["error"] = e.detail
+    with timed("render"):
+        return batch_response(
+            options,
+            results,
+            [result for result, _ in fetched],
+            [data for _, data in fetched],
+        )
 
-    request_verse = create_request_verse(db=db, **kwargs)
-    kwargs["request"] = request
-    arguments = flatten_args(db=db, options=options, **kwargs)
 
-    kwargs.update(multi_query(db, **arguments))
+def batch_response(options: Options, results: list, found: list, verses: list):
+    """
+    Render the results of batch_lookup, 'found' being the results 'verses' belong to.
+    """
+    for result, data in zip(found, verses):
+        result["text"] = format_verses(data, options, {})["text"]
 
     if options.return_json:
-        kwargs["request_verse"] = request_verse
-        if "request" in kwargs:
-            kwargs.pop("request")
-        if "options" in kwargs:
-            kwargs.get("options").request = None
-        return kwargs
+        return JSONResponse(
+            content=jsonable_encoder({"options": options.to_json(), "results": results})
+        )
     if options.text_only:
-        return PlainTextResponse(content=kwargs.get("text"))
-    result = create_book(
-        bible_verse=kwargs.get("text"),
-        user_options=options,
-        request_verse=request_verse,
+        return PlainTextResponse(
+            content="\n\n".join(
+                f"{result.get('request_verse', result['reference'])}\n"
+                + result.get("text", result.get("error"))
+                for result in results
+            )
+        )
+    return PlainTextResponse(
+        content="".join(
+            (
+                create_book(
+                    bible_verse=result["text"],
+                    user_options=options,
+                    request_verse=result["request_verse"],
+                )
+                if "text" in result
+                else f"{result['reference']}: {result['error']}\n"
+            )
+            for result in results
+        )
     )
-    return PlainTextResponse(content=result)
 
 
-@app.get("/{book}/{chapter}")
-@limiter.limit(settings.RATE_LIMIT)
-async def entire_chapter(
+@app.get("/search", openapi_extra=OPTIONS_OPENAPI)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
+async def search(
     request: Request,
-    book: str,
-    chapter: str,
-    db_session: Session = Depends(get_database_session),
-    options: Options = Depends(),
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(
+        default=settings.SEARCH_RESULTS_DEFAULT, ge=1, le=settings.SEARCH_RESULTS_MAX
+    ),
+    db: AsyncSession = Depends(get_async_database_session),
+    options: Options = Depends(request_options),
 ):
-    kwargs = dict()
-    arguments = flatten_args(
-        db=db_session, book=book, chapter=chapter, options=options, request=request
-    )
-    request_verse = create_request_verse(db=db_session, book=book, chapter=chapter)
-    kwargs.update(multi_query(db_session, **arguments))
+    """
+    Find the verses containing the words of 'q' ('/search?q=love+one+another'),
+    best match first. Returned as JSON, text or a book depending on the options.
+    """
+    options = apply_docs_referer(options, request)
+    version = options.version.upper()
+    if version not in TRANSLATION_TABLES:
+        raise UserError(f"Version {version} not found.")
+    if not search_index.has_translation(version):
+        return JSONResponse(
+            content={"detail": "Search is not available yet, try again later."},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
 
+    with timed("query"):
+        matches = search_index.search(version, q, limit)
+        verses = await async_verses_by_id(db, version, [verse for verse, _ in matches])
+    if not verses:
+        raise UserError(f"No verses found for '{q}'.")
+    with timed("render"):
+        return search_response(options, q, version, dict(matches), verses)
+
+
+def search_response(options: Options, query: str, version: str, scores, verses):
+    """
+    Render the verses found by search, 'scores' being their score by verse id.
+    """
+    results = [
+        {
+            "reference": f"{book_index.primary_name(verse.book)} {verse.chapter}:{verse.verse}",
+            "book": verse.book,
+            "chapter": verse.chapter,
+            "verse": verse.verse,
+            "score": round(scores[verse_id(verse.book, verse.chapter, verse.verse)], 4),
+            "text": verse.text,
+        }
+        for verse in verses
+    ]
     if options.return_json:
-        kwargs["request_verse"] = request_verse
-        if "request" in kwargs:
-            kwargs.pop("request")
-        if "options" in kwargs:
-            kwargs.get("options").request = None
-        return kwargs
+        return JSONResponse(
+            content={"query": query, "version": version, "results": results}
+        )
+    lines = [f"{result['reference']} {result['text']}" for result in results]
     if options.text_only:
-        return PlainTextResponse(content=kwargs.get("text"))
-    result = create_book(
-        bible_verse=kwargs.get("text"),
-        user_options=options,
-        request_verse=request_verse,
+        return PlainTextResponse(content="\n".join(lines))
+    return PlainTextResponse(
+        content=create_book(
+            bible_verse=" ".join(lines),
+            user_options=options,
+            # Fit the title on a page (see BookTemplate)
+            request_verse=shorten(
+                f"Search: {query}", width=options.width // 2 - 2, placeholder="..."
+            ),
+        )
     )
-    return PlainTextResponse(content=result)
 
 
-@app.get("/{book}/{chapter}/{verse}")
-@limiter.limit(settings.RATE_LIMIT)
-async def flatten_out(
+@app.get("/", openapi_extra=OPTIONS_OPENAPI)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
+async def as_arguments_book_chapter_verse(
+    request: Request,
+    book: Union[str | None] = Query(default=None),
+    chapter: Union[int, None] = Query(default=None, ge=0, le=50),
+    verse: Union[str, None] = Query(default=None, pattern=settings.VERSE_REGEX),
+    db_session: AsyncSession = Depends(get_async_database_session),
+    options: Options = Depends(request_options),
+):
+    if book is None and chapter is None and verse is None:
+        book = choice(["Matthew", "Mark", "Luke", "John", "Rev"])
+        chapter = randint(1, 10)
+        verse = f"{randint(1,5)}-{randint(6,10)}"
+        return await verse_response(
+            db_session, request, options, f"{book}/{chapter}/{verse}", random=True
+        )
+    reference = query_reference(book, chapter, verse)
+    return await verse_response(db_session, request, options, reference)
+
+
+@app.get("/{query}", openapi_extra=OPTIONS_OPENAPI)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
+async def query_many(
+    request: Request,
+    query: str,
+    db: AsyncSession = Depends(get_async_database_session),
+    options: Options = Depends(request_options),
+):
+    return await verse_response(db, request, options, query)
+
+
+@app.get("/{book}/{chapter}", openapi_extra=OPTIONS_OPENAPI)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
+async def entire_chapter(
     request: Request,
     book: str,
     chapter: str,
-    verse: str,
-    db: Session = Depends(get_database_session),
-    options: Options = Depends(),
+    db_session: AsyncSession = Depends(get_async_database_session),
+    options: Options = Depends(request_options),
 ):
-    kwargs = dict()
-
-    if "-" in verse:
-        verse_start, verse_end = verse.split("-")
-        request_verse = create_request_verse(
-            db=db,
-            book=book,
-            chapter=chapter,
-            verse_start=verse_start,
-            verse_end=verse_end,
-        )
-        arguments = flatten_args(
-            db,
-            book=book,
-            chapter=chapter,
-            verse_start=verse_start,
-            verse_end=verse_end,
-            options=options,
-            request=request,
-        )
-    else:
-        request_verse = create_request_verse(
-            db=db, book=book, chapter=chapter, verse=verse
-        )
-        arguments = flatten_args(
-            db,
-            book=book,
-            chapter=chapter,
-            verse=verse,
-            options=options,
-            request=request,
-        )
+    return await verse_response(db_session, request, options, f"{book}/{chapter}")
 
-    kwargs.update(multi_query(db, **arguments))
 
-    if options.return_json:
-        kwargs["request_verse"] = request_verse
-        if "request" in kwargs:
-            kwargs.pop("request")
-        if "options" in kwargs:
-            kwargs.get("options").request = None
-        return kwargs
-    if options.text_only:
-        return PlainTextResponse(content=kwargs.get("text"))
-    result = create_book(
-        bible_verse=kwargs.get("text"),
-        user_options=options,
-        request_verse=request_verse,
-    )
-    return PlainTextResponse(content=result)
+@app.get("/{book}/{chapter}/{verse}", openapi_extra=OPTIONS_OPENAPI)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
+async def flatten_out(
+    request: Request,
+    book: str,
+    chapter: str,
+    verse: str,
+    db: AsyncSession = Depends(get_async_database_session),
+    options: Options = Depends(request_options),
+):
+    return await verse_response(db, request, options, f"{book}/{chapter}/{verse}")
 
 
-@app.get("/{book}/{chapter}/{verse_start}/{verse_end}")
-@limiter.limit(settings.RATE_LIMIT)
+@app.get("/{book}/{chapter}/{verse_start}/{verse_end}", openapi_extra=OPTIONS_OPENAPI)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
 async def mutli_verse_same_chapter(
     request: Request,
     book: str,
     chapter: str,
     verse_start: str,
     verse_end: str,
-    db: Session = Depends(get_database_session),
-    options: Options = Depends(),
+    db: AsyncSession = Depends(get_async_database_session),
+    options: Options = Depends(request_options),
 ):
-    kwargs = dict()
-    request_verse = create_request_verse(
-        db=db, book=book, chapter=chapter, verse_start=verse_start, verse_end=verse_end
-    )
-    arguments = flatten_args(
-        db=db,
-        book=book,
-        chapter=chapter,
-        verse_start=verse_start,
-        verse_end=verse_end,
-        options=options,
-        request=request,
-    )
-    kwargs.update(multi_query(db, **arguments))
-
-    if options.return_json:
-        kwargs["request_verse"] = request_verse
-        if "request" in kwargs:
-            kwargs.pop("request")
-        if "options" in kwargs:
-            kwargs.get("options").request = None
-        return kwargs
-    if options.text_only:
-        return PlainTextResponse(content=kwargs.get("text"))
-    result = create_book(
-        bible_verse=kwargs.get("text"),
-        user_options=options,
-        request_verse=request_verse,
+    return await verse_response(
+        db, request, options, f"{book}/{chapter}/{verse_start}/{verse_end}"
     )
-    return PlainTextResponse(content=result)
 
 
 @app.get("/versions")
-@limiter.limit(settings.RATE_LIMIT)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
 def show_bible_versions(request: Request):
     """
     Return a list of the bibles supported by this webapp.
@@ -378,7 +791,7 @@ def show_bible_versions(request: Request):
 
 
 @app.get("/help")
-@limiter.limit(settings.RATE_LIMIT)
+@limiter.limit(settings.RATE_LIMIT, exempt_when=rate_limit_exempt)
 def display_help(request: Request):
     """
     Display a help message detailing all supported query methods and options.
@@ -0,0 +1,139 @@
+"""
+Build the SQLite copy of the Bible (used when DB_BACKEND=sqlite) from the
+MySQL dump in bible_db/:
+
+    python -m curl_bible.sqlite_loader bible_db/bible-sql.sql bible_db/bible.sqlite3
+"""
+
+import os
+import re
+import sqlite3
+from argparse import ArgumentParser
+
+# Table name -> columns, in the order of the values in the dump
+TABLES = {
+    "key_abbreviations_english": ("id", "name", "book", "primary"),
+    "t_asv": ("id", "book", "chapter", "verse", "text"),
+    "t_bbe": ("id", "book", "chapter", "verse", "text"),
+    "t_kjv": ("id", "book", "chapter", "verse", "text"),
+    "t_web": ("id", "book", "chapter", "verse", "text"),
+    "t_ylt": ("id", "book", "chapter", "verse", "text"),
+}
+
+INSERT_REGEX = re.compile(r"INSERT INTO `(\w+)`(?: \([^)]*\))? VALUES", re.IGNORECASE)
+# '(', ')', ';', a quoted string or a bare value (numbers, NULL)
+TOKEN_REGEX = re.compile(r"[();]|'(?:[^'\\]|\\.|'')*'|[^,();'\s]+", re.DOTALL)
+ESCAPE_REGEX = re.compile(r"\\(.)|''", re.DOTALL)
+ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def unescape(match) -> str:
+    if match.group(1) is None:
+        return "'"
+    return ESCAPES.get(match.group(1), match.group(1))
+
+
+def parse_value(token: str):
+    if token.startswith("'"):
+        return ESCAPE_REGEX.sub(unescape, token[1:-1])
+    if token.upper() == "NULL":
+        return None
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+def column_definition(column: str) -> str:
+    if column == "id":
+        return '"id" INTEGER PRIMARY KEY'
+    if column in ("name", "text"):
+        return f'"{column}" VARCHAR(255)'
+    return f'"{column}" INTEGER'
+
+
+def iter_dump_rows(dump: str, tables=TABLES):
+    """
+    Yield (table, row) for every row inserted into one of 'tables' by the
+    'INSERT INTO `table` VALUES (...),(...);' statements of a MySQL dump.
+    """
+    position = 0
+    while True:
+        insert = INSERT_REGEX.search(dump, position)
+        if insert is None:
+            return
+        table = insert.group(1)
+        row = None
+        for token in TOKEN_REGEX.finditer(dump, insert.end()):
+            value = token.group()
+            position = token.end()
+            if value == ";":
+                break
+            if value == "(":
+                row = []
+            elif value == ")":
+                if table in tables:
+                    yield table, tuple(row)
+            elif table in tables:
+                row.append(parse_value(value))
+
+
+def build_sqlite(dump_path: str, sqlite_path: str, tables=TABLES) -> dict:
+    """
+    Create a SQLite database at 'sqlite_path' holding 'tables' from the dump.
+    The database is written next to its destination and moved into place
+    once complete, so a running server never sees a half-built file.
+    Returns:
+        (dict): The number of rows loaded into each table.
+    """
+    with open(dump_path, "r", encoding="utf-8") as f:
+        dump = f.read()
+
+    temporary_path = f"{sqlite_path}.tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    counts = dict.fromkeys(tables, 0)
+    db = sqlite3.connect(temporary_path)
+    try:
+        for table, columns in tables.items():
+            definitions = ", ".join(column_definition(column) for column in columns)
+            db.execute(f'CREATE TABLE "{table}" ({definitions})')
+
+        for table, row in iter_dump_rows(dump, tables):
+            columns = tables[table]
+            if len(row) != len(columns):
+                raise ValueError(f"Expected {len(columns)} values in {table}: {row}")
+            db.execute(
+                f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(columns))})', row
+            )
+            counts[table] += 1
+
+        for table, columns in tables.items():
+            if "verse" in columns:
+                db.execute(
+                    f'CREATE INDEX "ix_{table}_reference" ON "{table}" (book, chapter, verse)'
+                )
+        db.commit()
+        db.execute("ANALYZE")
+        db.execute("VACUUM")
+    finally:
+        db.close()
+
+    os.replace(temporary_path, sqlite_path)
+    return counts
+
+
+def main(args=None) -> None:
+    parser = ArgumentParser(description="Build the SQLite Bible from the MySQL dump.")
+    parser.add_argument("dump", nargs="?", default="bible_db/bible-sql.sql")
+    parser.add_argument("output", nargs="?", default="bible_db/bible.sqlite3")
+    args = parser.parse_args(args)
+
+    counts = build_sqlite(args.dump, args.output)
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+from curl_bible.benchmarks.render import compare as compare_render
+from curl_bible.benchmarks.render import render_cases, run_benchmark
+from curl_bible.benchmarks.routes import (
+    compare,
+    fixture_dump,
+    fixture_rows,
+    percentile,
+    summarize,
+)
+from curl_bible.sqlite_loader import iter_dump_rows
+
+
+def test_fixture_dump():
+    translations, abbreviations = fixture_rows()
+    assert fixture_rows() == (translations, abbreviations)
+
+    rows = list(iter_dump_rows(fixture_dump(translations, abbreviations)))
+    assert sum(table == "t_kjv" for table, _ in rows) == len(translations["KJV"])
+    assert rows[0] == ("t_asv", (1001001, 1, 1, 1, translations["ASV"][0][3]))
+    assert ("key_abbreviations_english", (5, "John", 43, 1)) in rows
+
+
+def test_percentiles():
+    latencies = [index / 1000 for index in range(1, 101)]
+    assert percentile(latencies, 0.5) == 0.05
+    assert percentile(latencies, 0.99) == 0.099
+    assert percentile(latencies, 0.07) == 0.007
+    assert percentile([0.1], 0.95) == 0.1
+    assert summarize(latencies, 2.0) == {
+        "requests": 100,
+        "throughput": 50.0,
+        "p50_ms": 50.0,
+        "p95_ms": 95.0,
+        "p99_ms": 99.0,
+    }
+
+
+def test_compare():
+    baseline = {"routes": {"text_only": {"8": {"p95_ms": 10.0, "throughput": 100.0}}}}
+    within = {"routes": {"text_only": {"8": {"p95_ms": 12.0, "throughput": 80.0}}}}
+    assert compare(within, baseline, 0.25) == []
+
+    slower = {"routes": {"text_only": {"8": {"p95_ms": 13.0, "throughput": 70.0}}}}
+    assert len(compare(slower, baseline, 0.25)) == 2
+    # Routes and levels missing from the baseline aren't compared
+    assert (
+        compare({"routes": {"new": slower["routes"]["text_only"]}}, baseline, 0) == []
+    )
+
+
+def test_render_cases():
+    cases = dict(render_cases([40], [20], {"verse": 1}))
+    assert sorted(cases) == [
+        "book/w40/l20/color/verse/numbers",
+        "book/w40/l20/color/verse/plain",
+        "book/w40/l20/plain/verse/numbers",
+        "book/w40/l20/plain/verse/plain",
+        "format/verse/numbers",
+        "format/verse/plain",
+    ]
+    assert cases["format/verse/numbers"]()["text"].startswith("¹")
+    assert "Psalms 119:1-176" in cases["book/w40/l20/plain/verse/plain"]()
+
+    results = run_benchmark([("verse", cases["format/verse/plain"])], 1000, 1)
+    assert results["verse"]["ns"] > 0 and results["verse"]["alloc_bytes"] > 0
+
+
+def test_render_compare():
+    baseline = {"cases": {"format/verse/plain": {"ns": 1000, "alloc_bytes": 200}}}
+    results = {"cases": {"format/verse/plain": {"ns": 1200, "alloc_bytes": 300}}}
+    assert compare_render(results, baseline, 0.25) == [
+        "format/verse/plain: alloc_bytes 300 against 200 in the baseline"
+    ]
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from curl_bible.books import BookIndex
+from curl_bible.database import Base
+from curl_bible.db_models import KeyAbbreviationsEnglish
+
+
+def test_primary_name_wins():
+    index = BookIndex()
+    index.build(
+        [
+            # 'Jude' is also an abbreviation of another book, listed first
+            ("Jude", 43, False),
+            ("John", 43, True),
+            ("Jn", 43, False),
+            ("Jude", 65, True),
+            ("Jud", 65, False),
+            # Ignored: a name can't be taken back by a later abbreviation
+            ("John", 1, False),
+        ]
+    )
+    assert index.resolve("Jude") == (65, "Jude")
+    assert index.resolve("John") == (43, "John")
+    assert index.resolve("Jn") == (43, "John")
+    assert index.primary_name(65) == "Jude"
+    assert index.primary_name(99) == "99"
+
+
+def test_resolve_ignores_case():
+    index = BookIndex()
+    index.build([("1 John", 62, True), ("1jn", 62, False)])
+    for name in ("1 john", "1 JOHN", "1Jn", "1JN"):
+        assert index.resolve(name) == (62, "1 John")
+    with pytest.raises(KeyError):
+        index.resolve("2 John")
+
+
+def test_refresh():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    index = BookIndex()
+    with Session(engine) as db:
+        db.add(KeyAbbreviationsEnglish(name="John", book=43, primary=True))
+        db.commit()
+        index.refresh(db)
+        assert index.loaded and index.resolve("john") == (43, "John")
+        with pytest.raises(KeyError):
+            index.resolve("Jn")
+
+        db.add(KeyAbbreviationsEnglish(name="Jn", book=43, primary=False))
+        db.commit()
+        index.refresh(db)
+    assert index.resolve("jn") == (43, "John")
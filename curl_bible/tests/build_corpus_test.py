@@ -0,0 +1,31 @@
+from curl_bible.books import VerseBounds
+from curl_bible.build_corpus import build_corpus, rows_from_dump
+from curl_bible.corpus import VerseCorpus
+
+DUMP = """
+INSERT INTO `t_kjv` VALUES (43003017,43,3,17,'For God sent not his Son into the world to condemn the world;'),(43003016,43,3,16,'For God so loved the world,'),(43004001,43,4,1,'When therefore the Lord knew');
+INSERT INTO `key_abbreviations_english` VALUES (1,'John',43,1),(2,'Jn',43,0);
+"""
+
+
+def test_build_corpus_from_dump(tmp_path):
+    dump_path = tmp_path / "dump.txt"
+    dump_path.write_text(DUMP, encoding="utf-8")
+    translations, abbreviations = rows_from_dump(str(dump_path))
+    assert abbreviations == [("John", 43, True), ("Jn", 43, False)]
+
+    output = str(tmp_path / "corpus.bin")
+    metadata = build_corpus(translations, abbreviations, output)
+    assert metadata["bounds"] == {"KJV": {"43": {"3": 17, "4": 1}}}
+
+    corpus = VerseCorpus()
+    corpus.map_file(output, verify=True)
+    assert corpus.metadata["checksum"] == metadata["checksum"]
+    assert corpus.metadata["abbreviations"] == [["John", 43, True], ["Jn", 43, False]]
+    verses = corpus.lookup("KJV", book=43, chapter=3)
+    assert [verse.verse for verse in verses] == [16, 17]
+
+    bounds = VerseBounds()
+    bounds.build_metadata(corpus.metadata["bounds"])
+    assert bounds.last_verse("KJV", 43, 3) == 17
+    assert bounds.last_verse("KJV", 43, 5) is None
@@ -0,0 +1,48 @@
+from curl_bible.cache import ResponseCache, etag_matches, make_etag
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2, max_bytes=1024)
+    cache.set("John 3:16", "a", 1)
+    cache.set("John 3:17", "b", 1)
+    assert cache.get("John 3:16") == "a"
+
+    cache.set("John 3:18", "c", 1)
+    assert cache.get("John 3:17") is None
+    assert cache.get("John 3:16") == "a"
+    assert cache.get("John 3:18") == "c"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_byte_limit():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.set("a", "a", 6)
+    cache.set("b", "b", 6)
+    assert len(cache) == 1 and cache.size == 6
+
+    # Larger than the whole cache, never stored
+    cache.set("c", "c", 11)
+    assert cache.get("c") is None
+    assert cache.get("b") == "b"
+
+
+def test_disabled():
+    cache = ResponseCache(max_entries=0, max_bytes=0)
+    cache.set("a", "a", 0)
+    assert cache.get("a") is None
+
+
+def test_make_etag():
+    etag = make_etag("0.2.7", ("John", "3", "16"), ("ASV", 80))
+    assert etag.startswith('"') and etag.endswith('"') and len(etag) == 34
+    assert etag == make_etag("0.2.7", ("John", "3", "16"), ("ASV", 80))
+    assert etag != make_etag("0.2.7", ("John", "3", "16"), ("KJV", 80))
+
+
+def test_etag_matches():
+    etag = make_etag("John 3:16")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert not etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,62 @@
+"""
+Serve the tests from a small SQLite Bible (see build_test_database) so the
+routes can be tested without MariaDB.
+"""
+
+import os
+import tempfile
+
+# ASV John 3:10-15, the verses of the golden responses in responses/
+JOHN_3 = [
+    "Jesus answered and said unto him, Art thou the teacher of Israel, and "
+    "understandest not these things?",
+    "Verily, verily, I say unto thee, We speak that which we know, and bear "
+    "witness of that which we have seen; and ye receive not our witness.",
+    "If I told you earthly things and ye believe not, how shall ye believe if "
+    "I tell you heavenly things?",
+    "And no one hath ascended into heaven, but he that descended out of "
+    "heaven, `even' the Son of man, who is in heaven.",
+    "And as Moses lifted up the serpent in the wilderness, even so must the "
+    "Son of man be lifted up;",
+    "that whosoever believeth may in him have eternal life.",
+]
+
+
+def build_test_database(directory: str) -> str:
+    """
+    Build the test database in 'directory': John 3:10-15 in the ASV, along
+    with the generated fixture Bible of the benchmarks in every version.
+    Returns:
+        (str): The path of the SQLite database.
+    """
+    from curl_bible.benchmarks.routes import fixture_dump, fixture_rows
+    from curl_bible.sqlite_loader import build_sqlite
+
+    translations, abbreviations = fixture_rows()
+    translations["ASV"] = [
+        row for row in translations["ASV"] if (row[0], row[1]) != (43, 3)
+    ] + [(43, 3, verse, text) for verse, text in enumerate(JOHN_3, 10)]
+    translations["ASV"].sort(key=lambda row: row[:3])
+
+    dump_path = os.path.join(directory, "test.sql")
+    with open(dump_path, "w", encoding="utf-8") as f:
+        f.write(fixture_dump(translations, abbreviations))
+    sqlite_path = os.path.join(directory, "test.sqlite3")
+    build_sqlite(dump_path, sqlite_path)
+    return sqlite_path
+
+
+def pytest_configure(config):
+    # The settings are read when curl_bible is first imported
+    directory = tempfile.mkdtemp(prefix="curl_bible_tests_")
+    os.environ.update(
+        {
+            "DB_BACKEND": "sqlite",
+            "SQLITE_PATH": build_test_database(directory),
+            "CORPUS_PATH": "",
+            "RATE_LIMIT": "1000000/second",
+            "RATE_LIMIT_STORAGE_URI": "memory://",
+            "INFLUXDB_URL": "",
+            "SEARCH_ENABLED": "False",
+        }
+    )
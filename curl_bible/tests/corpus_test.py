@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from curl_bible import config
+from curl_bible.config import UserError, async_batch_query, settings
+from curl_bible.corpus import VerseCorpus, write_corpus_file
+
+ROWS = [
+    (43, 3, 17, "For God sent not the Son into the world to judge the world;"),
+    (43, 3, 16, "For God so loved the world,"),
+    (43, 4, 1, "When therefore the Lord knew"),
+    (43, 3, 1, "Now there was a man of the Pharisees,"),
+    (1, 1, 1, "In the beginning God created the heavens and the earth."),
+]
+
+
+def create_corpus() -> VerseCorpus:
+    corpus = VerseCorpus()
+    corpus.add_translation("ASV", ROWS)
+    return corpus
+
+
+def test_single_verse():
+    corpus = create_corpus()
+    (verse,) = corpus.lookup("ASV", book="43", chapter="003", verse="016")
+    assert (verse.book, verse.chapter, verse.verse) == (43, 3, 16)
+    assert verse.text == "For God so loved the world,"
+
+
+def test_verse_range_and_chapter():
+    corpus = create_corpus()
+    verses = corpus.lookup("ASV", book=43, chapter=3, verse_start=2, verse_end=17)
+    assert [verse.verse for verse in verses] == [16, 17]
+
+    chapter = corpus.lookup("ASV", book=43, chapter=3)
+    assert [verse.verse for verse in chapter] == [1, 16, 17]
+
+
+def test_multi_chapter():
+    corpus = create_corpus()
+    verses = corpus.lookup(
+        "ASV", book=43, chapter_start=3, verse_start=17, chapter_end=4, verse_end=1
+    )
+    assert [(verse.chapter, verse.verse) for verse in verses] == [(3, 17), (4, 1)]
+
+
+def test_limit():
+    corpus = create_corpus()
+    verses = corpus.lookup("ASV", limit=2, book=43, chapter=3)
+    assert [verse.verse for verse in verses] == [1, 16]
+    assert len(corpus.lookup("ASV", limit=5, book=43, chapter=3)) == 3
+
+
+def test_batch_budget(monkeypatch):
+    monkeypatch.setattr(config, "corpus", create_corpus())
+    monkeypatch.setattr(settings, "BATCH_MAX_VERSES", 4)
+    chapter = ("ASV", {"book": 43, "chapter": 3})
+    (verses,) = asyncio.run(async_batch_query(None, [chapter]))
+    assert [verse.verse for verse in verses] == [1, 16, 17]
+    with pytest.raises(UserError):
+        asyncio.run(async_batch_query(None, [chapter, chapter]))
+
+
+def test_missing_verses():
+    corpus = create_corpus()
+    assert corpus.lookup("ASV", book=43, chapter=3, verse=99) == []
+    assert corpus.lookup("ASV", book=66, chapter=1) == []
+    assert not corpus.has_translation("KJV")
+
+
+def test_multi_book():
+    corpus = create_corpus()
+    verses = corpus.lookup(
+        "ASV",
+        book=1,
+        chapter_start=1,
+        verse_start=1,
+        book_end=43,
+        chapter_end=3,
+        verse_end=16,
+    )
+    assert [(verse.book, verse.chapter, verse.verse) for verse in verses] == [
+        (1, 1, 1),
+        (43, 3, 1),
+        (43, 3, 16),
+    ]
+
+
+def test_mapped_corpus_file(tmp_path):
+    rows = ROWS + [(43, 3, 18, "Ὁ πιστεύων εἰς αὐτὸν οὐ κρίνεται·")]
+    path = tmp_path / "corpus.bin"
+    write_corpus_file(str(path), {"ASV": rows}, {"source": "test"})
+
+    corpus = VerseCorpus()
+    corpus.map_file(str(path))
+    assert corpus.metadata["source"] == "test"
+    assert corpus.lookup("ASV", book=43, chapter=3) == create_corpus().lookup(
+        "ASV", book=43, chapter=3
+    ) + [(43, 3, 18, "Ὁ πιστεύων εἰς αὐτὸν οὐ κρίνεται·")]
+    assert corpus.lookup(
+        "ASV",
+        book=1,
+        chapter_start=1,
+        verse_start=1,
+        book_end=43,
+        chapter_end=3,
+        verse_end=1,
+    ) == [rows[4], rows[3]]
+    assert corpus.lookup("ASV", book="43", chapter="003", verse="099") == []
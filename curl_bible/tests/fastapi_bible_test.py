@@ -1,6 +1,9 @@
 from fastapi.testclient import TestClient
 
 from curl_bible import server
+from curl_bible.database import SessionLocal
+from curl_bible.db_models import TRANSLATION_TABLES
+from curl_bible.search import search_index
 
 app = server.app
 client = TestClient(app)
@@ -74,3 +77,176 @@ def compare(response, text: str) -> None:
     with open(f"curl_bible/tests/responses/{text}", "r", encoding="utf-8") as f:
         sample_response = f.read()
         assert response.text == sample_response
+
+
+def test_etag_not_modified():
+    with TestClient(app) as test_client:
+        response = test_client.get("/John:3:10")
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"].startswith("public, max-age=")
+        assert test_client.get("/John/3/10").headers["etag"] == etag
+        attached = test_client.get("/John:3:10?options=w%3D60").headers["etag"]
+        assert attached == test_client.get("/John:3:10?w=60").headers["etag"] != etag
+
+        response = test_client.get("/John:3:10", headers={"If-None-Match": etag})
+        assert response.status_code == 304 and response.text == ""
+        response = test_client.get("/John:3:10", headers={"If-None-Match": '"a"'})
+        assert response.status_code == 200
+
+
+def test_unknown_book_is_never_not_modified():
+    with TestClient(app) as test_client:
+        for if_none_match in ("*", 'W/"a", *'):
+            response = test_client.get(
+                "/Foo:3:16", headers={"If-None-Match": if_none_match}
+            )
+            assert response.status_code == 400
+        response = test_client.get("/John:3:10", headers={"If-None-Match": "*"})
+        assert response.status_code == 200
+
+
+def test_range_size_limit():
+    with TestClient(app) as test_client:
+        # About 5000 verses of the test Bible, in one version or several
+        for request in [
+            "/Genesis:1:1:John:21:40",
+            "/Gen:1:1:John:21:40?versions=ASV,KJV",
+        ]:
+            response = test_client.get(request)
+            assert response.status_code == 400
+            assert response.json()["detail"].startswith("Too many verses!")
+        assert test_client.get("/Genesis:1:1-3:30?t=1").status_code == 200
+
+        response = test_client.post(
+            "/batch?j=1", json={"references": ["Genesis:1:1-40:30", "John:3:12"]}
+        )
+        too_many, found = response.json()["results"]
+        assert too_many["error"].startswith("Too many verses!")
+        assert "text" in found
+
+
+def test_batch_size_limit():
+    with TestClient(app) as test_client:
+        # 970 verses each, 5 of them fit the batch but not 6
+        chapters = "Genesis:1:1-33:10"
+        response = test_client.post("/batch?j=1", json={"references": [chapters] * 5})
+        assert response.status_code == 200
+        for references in ([chapters] * 6, ["Genesis:1:1:John:21:40"] * 100):
+            response = test_client.post("/batch?j=1", json={"references": references})
+            assert response.status_code == 400
+            assert response.json()["detail"].startswith("Too many verses!")
+
+
+def test_query_parameters():
+    with TestClient(app) as test_client:
+        response = test_client.get("/?book=John&chapter=3&verse=10-11&t=1")
+        assert response.status_code == 200
+        assert response.text == test_client.get("/John:3:10-11?t=1").text
+        response = test_client.get("/?book=John&verse=3")
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Verse 3 needs a chapter."
+
+
+def test_out_of_bounds():
+    with TestClient(app) as test_client:
+        for request, detail in [
+            ("/John:4:99", "Verse John 4:99 not found, the chapter has 40 verses."),
+            ("/John:4:0", "Verse John 4:0 not found, the chapter has 40 verses."),
+            ("/John/22", "Chapter John 22 not found."),
+            ("/John:4:38-41", "Verse John 4:41 not found, the chapter has 40 verses."),
+            ("/John:21:40-22:1", "Chapter John 22 not found."),
+            ("/Gen:51:1:John:1:1", "Chapter Genesis 51 not found."),
+            (
+                "/John:4:99?versions=ASV,KJV",
+                "Verse John 4:99 not found, the chapter has 40 verses.",
+            ),
+        ]:
+            response = test_client.get(request)
+            assert response.status_code == 400
+            assert response.json()["detail"] == detail
+        assert test_client.get("/John:4:38-40").status_code == 200
+
+
+def test_batch_errors_in_place():
+    references = ["John:3:10", "John", "John:x:1", "Foo:1:1", "John:4:99", "John:3:1"]
+    with TestClient(app) as test_client:
+        response = test_client.post("/batch?j=1", json={"references": references})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["reference"] for result in results] == references
+        assert "Art thou the teacher of Israel" in results[0]["text"]
+        assert [result.get("error") for result in results[1:]] == [
+            "Reference John not understood.",
+            "Invalid chapter! chapter is not a number!",
+            "Book Foo not found.",
+            "Verse John 4:99 not found, the chapter has 40 verses.",
+            "No verses found for John 3:1.",
+        ]
+
+
+def test_stream_matches_book():
+    with TestClient(app) as test_client:
+        response = test_client.get("/John:3:10-15?stream=true")
+        compare(response, "colon_multi_verse.txt")
+        # Long enough to be wrapped a chunk at a time
+        for query in ("w=40&l=80", "c=false&n=true"):
+            streamed = test_client.get(f"/John:4?{query}&s=true")
+            assert streamed.headers["content-type"] == "text/plain; charset=utf-8"
+            assert streamed.content == test_client.get(f"/John:4?{query}").content
+
+
+def test_pages():
+    with TestClient(app) as test_client:
+        text = test_client.get("/John:4?j=1").json()["text"]
+        assert "page" not in test_client.get("/John:4?j=1").json()
+
+        pages = []
+        page = 1
+        while page is not None:
+            response = test_client.get(f"/John:4?j=1&w=40&l=10&p={page}")
+            assert response.status_code == 200
+            content = response.json()
+            assert content["page"] == page
+            pages.append(content["text"])
+            page = content["next_page"]
+        # Every page holds the next part of the text, the last one has no next
+        assert len(pages) > 2 and content["next_page"] is None
+        assert " ".join(pages) == text
+        response = test_client.get(f"/John:4?t=1&w=40&l=10&p={len(pages)}")
+        assert response.text == pages[-1]
+
+        response = test_client.get(f"/John:4?w=40&l=10&p={len(pages) + 1}")
+        assert response.status_code == 400
+        assert response.json()["detail"] == f"Page {len(pages) + 1} not found."
+        # A passage that fits on one page only has the first
+        content = test_client.get("/John:3:10?j=1&p=1").json()
+        assert content["page"] == 1 and content["next_page"] is None
+        assert test_client.get("/John:3:10?p=2").status_code == 400
+
+
+def test_search():
+    with TestClient(app) as test_client:
+        response = test_client.get("/search?q=teacher+of+Israel&j=1")
+        assert response.status_code == 503
+
+        with SessionLocal() as db:
+            search_index.load(db, {"ASV": TRANSLATION_TABLES["ASV"]})
+        try:
+            response = test_client.get("/search?q=teacher+of+Israel&j=1&limit=2")
+            assert response.status_code == 200
+            content = response.json()
+            assert content["query"] == "teacher of Israel"
+            assert content["version"] == "ASV"
+            best = content["results"][0]
+            assert best["reference"] == "John 3:10"
+            assert (best["book"], best["chapter"], best["verse"]) == (43, 3, 10)
+            assert "teacher of Israel" in best["text"] and best["score"] > 0
+            assert len(content["results"]) <= 2
+
+            response = test_client.get("/search?q=love&v=XYZ")
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Version XYZ not found."
+            # Indexed versions are searched, the others aren't available yet
+            assert test_client.get("/search?q=love&v=KJV").status_code == 503
+        finally:
+            search_index.clear()
@@ -0,0 +1,112 @@
+import logging
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Event, Thread
+
+import pytest
+
+from curl_bible.influxdb import InfluxDBBatchWriter, InfluxDBHTTPHandler
+
+
+class InfluxDBStub(BaseHTTPRequestHandler):
+    """
+    Accepts writes like the InfluxDB v2 API and keeps their line protocol.
+    """
+
+    writes = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.writes.append((self.path, body.decode("utf-8").splitlines()))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def influxdb_url(monkeypatch):
+    InfluxDBStub.writes = []
+    server = HTTPServer(("127.0.0.1", 0), InfluxDBStub)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setenv("INFLUXDB_URL", url)
+    monkeypatch.setenv("INFLUXDB_TOKEN", "token")
+    monkeypatch.setenv("INFLUXDB_ORG", "org")
+    monkeypatch.setenv("INFLUXDB_BUCKET", "curl_bible")
+    yield url
+    server.shutdown()
+    thread.join()
+
+
+def log_record(message: str) -> logging.LogRecord:
+    return logging.makeLogRecord(
+        {"msg": message, "levelno": logging.INFO, "name": "test", "lineno": 1}
+    )
+
+
+def test_handler_writes_batches(influxdb_url, monkeypatch):
+    monkeypatch.setenv("INFLUXDB_BATCH_SIZE", "3")
+    monkeypatch.setenv("INFLUXDB_FLUSH_INTERVAL", "0.05")
+    handler = InfluxDBHTTPHandler()
+    for index in range(5):
+        handler.emit(log_record(f"message {index}"))
+    handler.close()
+
+    assert handler.batcher.stats() == {
+        "queued": 0,
+        "flushed": 5,
+        "dropped": 0,
+        "failed": 0,
+    }
+    assert [len(lines) for _, lines in InfluxDBStub.writes] == [3, 2]
+    assert all(path.startswith("/api/v2/write") for path, _ in InfluxDBStub.writes)
+
+
+def test_emit_does_not_wait_for_influxdb():
+    released = Event()
+    batcher = InfluxDBBatchWriter(
+        lambda points: released.wait(), batch_size=1, flush_interval=0.01
+    )
+    start = time.perf_counter()
+    for index in range(100):
+        batcher.put(index)
+    elapsed = time.perf_counter() - start
+    released.set()
+    batcher.close()
+
+    assert elapsed < 0.1
+    assert batcher.flushed == 100
+
+
+@pytest.mark.parametrize(
+    "drop_policy, expected", [("oldest", [2, 3, 4]), ("newest", [0, 1, 2])]
+)
+def test_full_queue_drops(drop_policy, expected):
+    written = []
+    batcher = InfluxDBBatchWriter(
+        written.extend,
+        max_queue=3,
+        batch_size=10,
+        flush_interval=60,
+        drop_policy=drop_policy,
+    )
+    accepted = [batcher.put(index) for index in range(5)]
+    batcher.close()
+
+    assert written == expected
+    assert accepted.count(False) == (2 if drop_policy == "newest" else 0)
+    assert (batcher.flushed, batcher.dropped) == (3, 2)
+
+
+def test_failed_writes_are_counted():
+    def write(points):
+        raise ConnectionError("InfluxDB is down")
+
+    batcher = InfluxDBBatchWriter(write, batch_size=2, flush_interval=0.01)
+    for index in range(3):
+        batcher.put(index)
+    batcher.close()
+    assert batcher.stats() == {"queued": 0, "flushed": 0, "dropped": 0, "failed": 3}
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+from curl_bible import server
+from curl_bible.metrics import latest_metrics, observe_request, route_label
+
+
+def fake_request(route=None):
+    scope = {} if route is None else {"route": SimpleNamespace(path=route)}
+    return SimpleNamespace(method="GET", scope=scope)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_route_label():
+    assert route_label(fake_request("/{book}/{chapter}")) == "/{book}/{chapter}"
+    assert route_label(fake_request()) == "unmatched"
+
+
+def test_observe_request():
+    labels = {"method": "GET", "route": "/{query}"}
+    requests = sample("curl_bible_requests_total", status="200", **labels)
+    durations = sample("curl_bible_request_duration_seconds_count", **labels)
+    sizes = sample("curl_bible_response_size_bytes_count", route="/{query}")
+
+    response = SimpleNamespace(status_code=200, headers={"content-length": "2048"})
+    observe_request(fake_request("/{query}"), response, 0.004)
+
+    assert sample("curl_bible_requests_total", status="200", **labels) == requests + 1
+    assert (
+        sample("curl_bible_request_duration_seconds_count", **labels) == durations + 1
+    )
+    assert sample("curl_bible_response_size_bytes_count", route="/{query}") == sizes + 1
+
+    content, media_type = latest_metrics()
+    assert media_type.startswith("text/plain")
+    assert b'curl_bible_requests_total{method="GET",route="/{query}"' in content
+
+
+def served_samples(test_client) -> dict:
+    """
+    The samples served on /metrics, keyed by their name and labels.
+    """
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def test_metrics_route():
+    def increase(name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        return after.get(key, 0.0) - before.get(key, 0.0)
+
+    with TestClient(server.app) as test_client:
+        before = served_samples(test_client)
+        # Options no other test uses: a miss, then a hit of the response cache
+        for _ in range(2):
+            assert test_client.get("/John:3:12?w=47&l=13").status_code == 200
+        assert test_client.get("/Foo:3:12").status_code == 400
+        assert test_client.get("/John/3/12?w=47&l=13").status_code == 200
+        after = served_samples(test_client)
+
+    requests = "curl_bible_requests_total"
+    assert increase(requests, method="GET", route="/{query}", status="200") == 2
+    assert increase(requests, method="GET", route="/{query}", status="400") == 1
+    assert (
+        increase(
+            requests, method="GET", route="/{book}/{chapter}/{verse}", status="200"
+        )
+        == 1
+    )
+    assert increase(requests, method="GET", route="/metrics", status="200") == 1
+    lookups = "curl_bible_response_cache_lookups_total"
+    assert increase(lookups, result="miss") == 1
+    assert increase(lookups, result="hit") == 2
+    assert after[("curl_bible_response_cache_bytes", ())] > 0
@@ -0,0 +1,103 @@
+import pytest
+
+from curl_bible.config import (
+    Options,
+    UserError,
+    apply_docs_referer,
+    parse_option_string,
+    parse_options,
+    settings,
+)
+
+
+class FakeRequest:
+    def __init__(self, referer: str) -> None:
+        self.headers = {"referer": referer}
+
+
+def test_parse_options_defaults():
+    options = parse_options("")
+    assert options == Options()
+    assert options.width == settings.WIDTH_DEFAULT
+
+
+def test_parse_options_names():
+    options = parse_options("l=45&width=70&c=false&text=1&v=kjv&numbers=no&j=true&p=2")
+    assert options == Options(
+        length=45,
+        width=70,
+        color_text=False,
+        text_only=True,
+        version="KJV",
+        verse_numbers=False,
+        return_json=True,
+        page=2,
+    )
+
+
+def test_parse_options_invalid_values():
+    for query in ("l=500", "l=3", "l=abc", "w=0", "p=0", "c=maybe", "v=", "l"):
+        with pytest.raises(UserError):
+            parse_options(query)
+    with pytest.raises(UserError):
+        parse_options("options=w%3D300")
+    assert parse_options("w=299&l=6") == Options(width=299, length=6)
+    # Parameters that aren't options are left to the routes
+    assert parse_options("q=love&limit=3&book=John") == Options()
+
+
+def test_parse_option_string():
+    assert parse_option_string("w=78,v=BBE,length=85,c=no") == {
+        "width": 78,
+        "version": "BBE",
+        "length": 85,
+        "color_text": False,
+    }
+    assert parse_option_string("'options=l=50',versions=asv,KJV,web") == {
+        "length": 50,
+        "versions": "ASV,KJV,WEB",
+    }
+    # Names that aren't options are ignored
+    assert parse_option_string("zz=1,w=40,") == {"width": 40}
+
+
+def test_parse_options_precedence():
+    options = parse_options("options=w%3D78%2Cv%3DBBE&w=40&w=50")
+    # The separate parameters win, the last of them first
+    assert options.width == 50 and options.version == "BBE"
+
+
+def test_parse_options_interned():
+    first = parse_options("w=40&c=no")
+    assert parse_options("w=40&c=no") is first
+    assert hash(first) == hash(Options(width=40, color_text=False))
+    # The same options passed in 'options' are the same Options
+    attached = parse_options("options=w%3D40%2Cc%3Dno")
+    assert attached == first and hash(attached) == hash(first)
+
+
+def test_apply_docs_referer():
+    options = parse_options("w=40")
+    docs = apply_docs_referer(options, FakeRequest("http://localhost/docs"))
+    assert docs.text_only and not options.text_only
+    assert apply_docs_referer(options, FakeRequest("http://localhost/")) is options
+
+
+def test_options_to_json():
+    content = parse_options("v=KJV&options=l%3D50").to_json()
+    assert content["v"] == "KJV" and content["l"] == 50
+    assert content["options"] is None and content["request"] is None
+    assert list(content) == [
+        "c",
+        "t",
+        "v",
+        "l",
+        "w",
+        "verse_numbers",
+        "return_json",
+        "stream",
+        "page",
+        "versions",
+        "options",
+        "request",
+    ]
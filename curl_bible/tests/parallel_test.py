@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from curl_bible.books import book_index
+from curl_bible.config import (
+    Options,
+    ParallelPages,
+    UserError,
+    book_template,
+    interleave_verses,
+    parallel_statement,
+    requested_versions,
+)
+from curl_bible.database import Base
+from curl_bible.db_models import TableASV, TableKJV
+
+Verse = namedtuple("Verse", ["book", "chapter", "verse", "text"])
+
+
+def test_requested_versions():
+    assert requested_versions(Options(versions="kjv,ASV kjv")) == ["KJV", "ASV"]
+    assert requested_versions(Options()) == []
+    with pytest.raises(UserError):
+        requested_versions(Options(versions="KJV,XYZ"))
+
+
+def test_parallel_statement():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        for table, text in ((TableASV, "ASV"), (TableKJV, "KJV")):
+            db.add_all(
+                table(id=43003000 + verse, book=43, chapter=3, verse=verse, text=text)
+                for verse in (15, 16, 17)
+            )
+        db.commit()
+        statement = parallel_statement(
+            ["KJV", "ASV"], book="43", chapter="003", verse_start="016", verse_end="017"
+        )
+        rows = db.execute(statement).all()
+
+    # Sorted by verse, the versions of a verse in any order
+    assert [row.verse for row in rows] == [16, 16, 17, 17]
+    assert {row.version for row in rows[:2]} == {"ASV", "KJV"}
+
+
+def test_interleave_verses():
+    verses = {
+        "KJV": [Verse(43, 3, 16, "For God"), Verse(43, 3, 17, "For God sent")],
+        "WEB": [Verse(43, 3, 16, "For God so")],
+    }
+    # The book name once the book names are loaded, its number until then
+    john = book_index.primary_name(43)
+    assert interleave_verses(verses) == (
+        f"{john} 3:16\nKJV For God\nWEB For God so\n\n{john} 3:17\nKJV For God sent"
+    )
+
+
+def test_parallel_pages():
+    options = Options(width=40, length=10, color_text=False)
+    texts = {version: f"{version} " + "word " * 30 for version in ("A", "B", "C")}
+    pages = ParallelPages(texts, options, "John 3:16")
+    template = book_template(40, False)
+
+    rows = list(pages.rows(1))
+    # A and B on the first spread, C alone on the second
+    assert rows.count(template.top) == 2 and len(rows) == 2 * (5 + 2)
+    assert "John 3:16 (A)" in rows[2] and "John 3:16 (B)" in rows[2]
+    assert "John 3:16 (C)" in rows[9] and rows[9].count("John") == 1
+
+    assert pages.next_page(1) == 2
+    page_two = pages.text(2)
+    assert list(page_two) == ["A", "B", "C"]
+    assert page_two["A"].startswith("word")
+    assert not pages.has_page(10)
@@ -0,0 +1,100 @@
+import time
+from multiprocessing import get_context
+from types import SimpleNamespace
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from curl_bible.rate_limit import SharedMemoryStorage, exempt_addresses
+
+
+@pytest.fixture
+def storage_uri(tmp_path):
+    return f"shm://{tmp_path / 'rate_limit'}"
+
+
+def test_counts_and_expiry(storage_uri):
+    storage = storage_from_string(storage_uri, slots=16)
+    assert isinstance(storage, SharedMemoryStorage)
+    assert storage.get("a") == 0
+
+    assert storage.incr("a", 60) == 1
+    assert storage.incr("a", 60, amount=2) == 3
+    assert storage.get("a") == 3
+    assert time.time() < storage.get_expiry("a") <= time.time() + 60
+
+    storage.clear("a")
+    assert storage.get("a") == 0
+
+    assert storage.incr("b", 0) == 1
+    # The window of 'b' has already ended
+    assert storage.incr("b", 60) == 1
+
+
+def test_every_process_shares_the_table(storage_uri):
+    storage = SharedMemoryStorage(storage_uri, slots=16)
+    storage.incr("a", 60)
+    # A new mapping of the same file, as another worker would open it
+    assert SharedMemoryStorage(storage_uri, slots=16).get("a") == 1
+    assert storage.reset() == 1
+    assert storage.get("a") == 0
+
+
+def test_other_layouts_are_replaced(storage_uri, tmp_path):
+    storage = SharedMemoryStorage(storage_uri, slots=16)
+    storage.incr("a", 60)
+    # Another number of slots gets a new table, the old one is left as it was
+    resized = SharedMemoryStorage(storage_uri, slots=32)
+    assert resized.get("a") == 0
+    assert storage.get("a") == 1 and storage.incr("a", 60) == 2
+    resized.incr("b", 60)
+    assert SharedMemoryStorage(storage_uri, slots=32).get("b") == 1
+
+    path = tmp_path / "rate_limit"
+    path.write_bytes(b"not a rate limit table")
+    assert SharedMemoryStorage(storage_uri, slots=16).get("a") == 0
+    assert path.stat().st_size == storage.size
+    assert sorted(tmp_path.iterdir()) == [path]
+
+
+def hit_limit(storage_uri, results):
+    limiter = FixedWindowRateLimiter(SharedMemoryStorage(storage_uri))
+    item = parse("50/minute")
+    results.put(sum(limiter.hit(item, "127.0.0.1") for _ in range(40)))
+
+
+def test_limit_holds_across_processes(storage_uri):
+    context = get_context("fork")
+    results = context.Queue()
+    processes = [
+        context.Process(target=hit_limit, args=(storage_uri, results)) for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert sum(results.get() for _ in processes) == 50
+
+
+def test_full_slots_reuse_the_oldest_window(storage_uri):
+    storage = SharedMemoryStorage(storage_uri, slots=1)
+    for index in range(9):
+        storage.incr(f"key {index}", 60 + index)
+    # Only 8 slots can hold a key, the first window was reused
+    assert storage.get("key 0") == 0
+    assert storage.get("key 8") == 1
+
+
+def test_exempt_addresses():
+    is_exempt = exempt_addresses("10.0.0.5, 192.168.0.0/24")
+
+    def request(host):
+        return SimpleNamespace(client=SimpleNamespace(host=host))
+
+    assert is_exempt(request("10.0.0.5"))
+    assert is_exempt(request("192.168.0.42"))
+    assert not is_exempt(request("10.0.0.6"))
+    assert not is_exempt(request("testclient"))
+    assert not exempt_addresses("")(request("10.0.0.5"))
@@ -0,0 +1,86 @@
+import pytest
+
+from curl_bible.config import (
+    Reference,
+    UserError,
+    parse_reference,
+    query_reference,
+    verse_id_range,
+)
+
+
+def test_parse_reference_formats():
+    assert parse_reference("John:3") == Reference("John", "3")
+    assert parse_reference("John/3/16").arguments() == {
+        "book": "John",
+        "chapter": "3",
+        "verse": "16",
+    }
+    expected = Reference("John", "3", verse_start="16", verse_end="18")
+    assert parse_reference("John:3:16-18") == expected
+    assert parse_reference("John/3/16-18") == expected
+    assert parse_reference("John/3/16/18") == expected
+    assert parse_reference("/John/03/016-18/") == expected
+    assert parse_reference("John:3:16-4:3").arguments() == {
+        "book": "John",
+        "chapter_start": "3",
+        "verse_start": "16",
+        "chapter_end": "4",
+        "verse_end": "3",
+    }
+    assert parse_reference("Genesis:1:1:Exodus:2:3").arguments() == {
+        "book": "Genesis",
+        "chapter_start": "1",
+        "verse_start": "1",
+        "book_end": "Exodus",
+        "chapter_end": "2",
+        "verse_end": "3",
+    }
+    assert parse_reference("Genesis/1/1/Exodus/2/3") == parse_reference(
+        "Genesis:1:1:Exodus:2:3"
+    )
+    assert parse_reference("1 John:3:16").book == "1 John"
+    # Checked once padded (see pad_arguments)
+    assert parse_reference("John/x/1") == Reference("John", "x", "1")
+    assert parse_reference("John") is None
+    assert parse_reference("John:3:16:Acts") is None
+
+
+def test_query_reference():
+    assert query_reference("John", 3, None) == parse_reference("John:3")
+    assert query_reference("John", 3, "016") == parse_reference("John:3:16")
+    assert query_reference(" John", 3, "16-18") == parse_reference("John:3:16-18")
+    for book, chapter, verse in [
+        ("John", None, "3"),
+        ("John", None, None),
+        (None, 3, "16"),
+    ]:
+        with pytest.raises(UserError):
+            query_reference(book, chapter, verse)
+
+
+def test_verse_id_range():
+    assert verse_id_range({"book": "43", "chapter": "003", "verse": "016"}) == (
+        43003016,
+        43003016,
+    )
+    assert verse_id_range({"book": "43", "chapter": "003"}) == (43003000, 43003999)
+    assert verse_id_range(
+        {
+            "book": "43",
+            "chapter_start": "003",
+            "chapter_end": "004",
+            "verse_start": "016",
+            "verse_end": "003",
+        }
+    ) == (43003016, 43004003)
+    assert verse_id_range(
+        {
+            "book": "1",
+            "chapter_start": "001",
+            "verse_start": "001",
+            "book_end": "2",
+            "chapter_end": "002",
+            "verse_end": "003",
+        }
+    ) == (1001001, 2002003)
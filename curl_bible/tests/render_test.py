@@ -0,0 +1,46 @@
+from textwrap import TextWrapper
+
+from curl_bible.config import Options, book_template, create_book, iter_wrap
+
+WORDS = "In the beginning was the Word, and the Word was with God.".split(" ")
+JOHN_1_1 = (
+    "In the beginning was the Word, and the Word was with God, and the Word was God."
+)
+# (width, length, request verse, text): one page, two full pages, a partial page
+BOOKS = [
+    (80, 20, "John 1:1", JOHN_1_1),
+    (61, 11, "John 1:1-14", " ".join([JOHN_1_1] * 12)),
+    (40, 30, "John 1", " ".join([JOHN_1_1] * 5)),
+]
+
+
+def test_iter_wrap_matches_wrap():
+    text = " ".join(WORDS * 40)
+    for width in (10, 37, 80):
+        for chunk_size in (1, 16, 2048):
+            lines = list(iter_wrap(text, width, chunk_size))
+            assert lines == TextWrapper(width=width).wrap(text)
+
+
+def test_iter_wrap_other_whitespace():
+    for separator in ("\n", " \n", "\n ", "\t", "\r\n", "  "):
+        text = separator.join(WORDS * 10)
+        for chunk_size in (1, 16):
+            lines = list(iter_wrap(text, 30, chunk_size))
+            assert lines == TextWrapper(width=30).wrap(text)
+
+
+def test_book_template_matches_original_book():
+    # Rendered by create_book before the frames were built once and reused
+    for color_text, name in ((True, "book_color.txt"), (False, "book_no_color.txt")):
+        with open(f"curl_bible/tests/responses/{name}", "r", encoding="utf-8") as f:
+            sample_response = f.read()
+        for _ in range(2):
+            books = []
+            for width, length, request_verse, text in BOOKS:
+                options = Options(color_text=color_text, width=width, length=length)
+                books.append(create_book(text, options, request_verse))
+            assert "".join(books) == sample_response
+        template = book_template(40, color_text)
+        assert book_template(40, color_text) is template
+        assert book_template(40, not color_text) is not template
@@ -0,0 +1,94 @@
+from curl_bible.corpus import VerseCorpus, verse_id
+from curl_bible.search import SearchIndex, TranslationIndex, parse_query, tokenize
+
+ROWS = [
+    (verse_id(43, 3, 16), "For God so loved the world"),
+    (verse_id(43, 13, 34), "That ye love one another; as I have loved you"),
+    (verse_id(62, 4, 8), "He that loveth not knoweth not God; for God is love."),
+    (verse_id(1, 1, 1), "In the beginning God created the heaven and the earth."),
+]
+
+
+def test_tokenize():
+    assert tokenize("The LORD's house, O God!") == [
+        "the",
+        "lord",
+        "s",
+        "house",
+        "o",
+        "god",
+    ]
+
+
+def test_postings():
+    index = TranslationIndex(ROWS)
+    posting = index.postings["god"]
+    assert list(posting.rows) == [0, 2, 3]
+    assert [posting.frequency(entry) for entry in range(3)] == [1, 2, 1]
+    # 'He that loveth not knoweth not God; for God is love.'
+    assert list(posting.positions[1:3]) == [6, 2]
+    assert posting.entry_positions(1) == [6, 8]
+    assert posting.entry(2) == 1 and posting.entry(1) == -1
+    assert list(index.lengths) == [6, 10, 11, 10]
+
+
+def test_bm25_ranking():
+    index = TranslationIndex(ROWS)
+    # 1 John 4:8 has both words, and 'love' is rarer than 'god'
+    assert [verse for verse, _ in index.search("god love", 10)] == [
+        verse_id(62, 4, 8),
+        verse_id(43, 13, 34),
+        verse_id(43, 3, 16),
+        verse_id(1, 1, 1),
+    ]
+    assert [verse for verse, _ in index.search("God", 2)] == [
+        verse_id(62, 4, 8),
+        verse_id(43, 3, 16),
+    ]
+    assert index.search("unknown words", 10) == []
+
+
+def test_parse_query():
+    assert parse_query('love NEAR/3 neighbour "thy God" mercy') == (
+        ["thy", "god", "love", "neighbour", "mercy"],
+        [("phrase", ["thy", "god"]), ("near", "love", "neighbour", 3)],
+    )
+    assert parse_query('"God"') == (["god"], [])
+
+
+def test_phrase_search():
+    index = TranslationIndex(ROWS)
+    assert index.phrase_rows(["the", "world"]) == {0}
+    assert index.phrase_rows(["world", "the"]) == set()
+    assert [verse for verse, _ in index.search('"the beginning" god', 10)] == [
+        verse_id(1, 1, 1)
+    ]
+    assert index.search('"god created the world"', 10) == []
+
+
+def test_near_search():
+    index = TranslationIndex(ROWS)
+    # 'God is love' in 1 John 4:8
+    assert index.near_rows("god", "love", 2) == {2}
+    assert index.near_rows("love", "god", 1) == set()
+    # The two 'not' of 1 John 4:8 are 2 words apart
+    assert index.near_rows("not", "not", 2) == {2}
+    assert index.near_rows("not", "not", 1) == set()
+    assert [verse for verse, _ in index.search("loved NEAR/4 world", 10)] == [
+        verse_id(43, 3, 16)
+    ]
+
+
+def test_index_corpus():
+    corpus = VerseCorpus()
+    corpus.add_translation(
+        "KJV",
+        [
+            (verse // 1_000_000, verse // 1000 % 1000, verse % 1000, text)
+            for verse, text in ROWS
+        ],
+    )
+    search_index = SearchIndex()
+    search_index.load_corpus(corpus)
+    assert search_index.has_translation("KJV")
+    assert search_index.search("KJV", "another", 10)[0][0] == verse_id(43, 13, 34)
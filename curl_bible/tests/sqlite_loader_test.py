@@ -0,0 +1,49 @@
+import sqlite3
+
+from curl_bible.sqlite_loader import build_sqlite, iter_dump_rows
+
+DUMP = """
+DROP TABLE IF EXISTS `t_kjv`;
+INSERT INTO `t_kjv` VALUES (1001001,1,1,1,'In the beginning God created the heaven and the earth.'),(43003016,43,3,16,'For God so loved the world, that he gave his only begotten Son; (it\\'s ''quoted'')');
+INSERT INTO `bible_version_key` VALUES (1,'t_kjv','KJV');
+INSERT INTO `key_abbreviations_english` VALUES (1,'Genesis',1,1),(2,'Jn',43,0);
+"""
+
+
+def test_iter_dump_rows():
+    rows = list(iter_dump_rows(DUMP))
+    assert [table for table, _ in rows] == [
+        "t_kjv",
+        "t_kjv",
+        "key_abbreviations_english",
+        "key_abbreviations_english",
+    ]
+    assert rows[1][1] == (
+        43003016,
+        43,
+        3,
+        16,
+        "For God so loved the world, that he gave his only begotten Son; (it's 'quoted')",
+    )
+
+
+def test_build_sqlite(tmp_path):
+    dump_path = tmp_path / "dump.txt"
+    dump_path.write_text(DUMP, encoding="utf-8")
+    sqlite_path = tmp_path / "bible.sqlite3"
+
+    counts = build_sqlite(str(dump_path), str(sqlite_path))
+    assert counts["t_kjv"] == 2 and counts["t_asv"] == 0
+
+    db = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    assert (
+        db.execute(
+            "SELECT text FROM t_kjv WHERE book = 43 AND chapter = 3 AND verse = 16"
+        )
+        .fetchone()[0]
+        .startswith("For God so loved")
+    )
+    assert db.execute(
+        'SELECT book FROM key_abbreviations_english WHERE name = "Jn"'
+    ).fetchone() == (43,)
+    db.close()
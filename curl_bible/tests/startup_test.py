@@ -0,0 +1,61 @@
+import asyncio
+from threading import Event
+from time import monotonic
+
+from fastapi.testclient import TestClient
+
+from curl_bible import server
+
+
+def test_connect_database_keeps_retrying(monkeypatch):
+    # The DB only answers after wait_for_database gave up twice
+    attempts = []
+    delays = []
+
+    async def wait_for_database():
+        attempts.append(1)
+        return len(attempts) > 2
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(server, "wait_for_database", wait_for_database)
+    monkeypatch.setattr(server, "sleep", sleep)
+    monkeypatch.setattr(server.app.state, "database_ready", False)
+
+    asyncio.run(server.connect_database())
+    assert len(attempts) == 3
+    assert delays == [server.db_settings.DB_CONNECT_BACKOFF_MAX] * 2
+    assert server.app.state.database_ready
+    assert server.book_index.loaded
+
+
+def test_readiness(monkeypatch):
+    # The DB can't be reached until 'reachable' is set
+    reachable = Event()
+
+    async def database_available():
+        return reachable.is_set()
+
+    async def sleep(delay):
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(server, "wait_for_database", database_available)
+    monkeypatch.setattr(server, "database_available", database_available)
+    monkeypatch.setattr(server, "sleep", sleep)
+    monkeypatch.setattr(server.app.state, "database_ready", False)
+
+    with TestClient(server.app) as test_client:
+        assert test_client.get("/healthz").json() == {"status": "ok"}
+        response = test_client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["status"] == "starting"
+
+        reachable.set()
+        deadline = monotonic() + 5
+        while response.status_code != 200 and monotonic() < deadline:
+            response = test_client.get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert response.json()["database"]
+        assert test_client.get("/healthz").status_code == 200
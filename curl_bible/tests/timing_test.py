@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+
+from curl_bible import server
+from curl_bible.timing import NULL_TIMER, request_timings, start_timings, timed
+
+
+def test_timed_does_nothing_without_timings():
+    assert request_timings.get() is None
+    assert timed("query") is NULL_TIMER
+    with timed("query"):
+        pass
+
+
+def test_stages_add_up():
+    timings, token = start_timings()
+    try:
+        with timed("query"):
+            pass
+        with timed("render"):
+            pass
+        with timed("query"):
+            pass
+    finally:
+        request_timings.reset(token)
+
+    durations = timings.durations()
+    assert list(durations) == ["query", "render", "total"]
+    assert durations["total"] >= durations["query"] + durations["render"]
+    assert request_timings.get() is None
+
+
+def test_header():
+    timings, token = start_timings()
+    request_timings.reset(token)
+    timings.add("query", 1_204_000)
+    assert timings.header({"query": 1.204, "total": 1.7364}) == (
+        "query;dur=1.204, total;dur=1.736"
+    )
+    assert timings.header().startswith("query;dur=1.204, total;dur=")
+
+
+def test_server_timing_header(monkeypatch):
+    monkeypatch.setattr(server.settings, "SERVER_TIMING_ENABLED", True)
+    with TestClient(server.app) as test_client:
+        # Options no other test uses, so the response isn't cached yet
+        response = test_client.get("/John:3:10-11?w=53&l=17")
+        assert response.status_code == 200
+        durations = dict(
+            entry.split(";dur=")
+            for entry in response.headers["server-timing"].split(", ")
+        )
+        assert list(durations) == ["reference", "books", "query", "render", "total"]
+        assert all(float(duration) >= 0 for duration in durations.values())
+
+        # A cached response is only looked up
+        response = test_client.get("/John:3:10-11?w=53&l=17")
+        assert response.headers["server-timing"].startswith("reference;dur=")
+        assert "query;" not in response.headers["server-timing"]
+
+    monkeypatch.setattr(server.settings, "SERVER_TIMING_ENABLED", False)
+    with TestClient(server.app) as test_client:
+        assert "server-timing" not in test_client.get("/John:3:10").headers
@@ -0,0 +1,89 @@
+from contextvars import ContextVar
+from time import perf_counter_ns
+
+# Timings of the request being handled, None unless SERVER_TIMING_ENABLED
+request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Time spent in each stage of a request ('reference', 'books', 'query',
+    'render'...), in nanoseconds from a monotonic clock. A stage entered
+    more than once (e.g. for every reference of a batch) adds up.
+    """
+
+    __slots__ = ("start", "stages")
+
+    def __init__(self) -> None:
+        self.start = perf_counter_ns()
+        self.stages = {}
+
+    def add(self, stage: str, elapsed: int) -> None:
+        self.stages[stage] = self.stages.get(stage, 0) + elapsed
+
+    def durations(self) -> dict:
+        """
+        Return every stage and the 'total' so far, in milliseconds.
+        """
+        durations = {stage: elapsed / 1e6 for stage, elapsed in self.stages.items()}
+        durations["total"] = (perf_counter_ns() - self.start) / 1e6
+        return durations
+
+    def header(self, durations: dict = None) -> str:
+        """
+        Format the durations as a Server-Timing header,
+        e.g. 'query;dur=1.204, render;dur=0.310, total;dur=1.736'.
+        """
+        durations = self.durations() if durations is None else durations
+        return ", ".join(
+            f"{stage};dur={duration:.3f}" for stage, duration in durations.items()
+        )
+
+
+class StageTimer:
+    __slots__ = ("timings", "stage", "start")
+
+    def __init__(self, timings: RequestTimings, stage: str) -> None:
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.timings.add(self.stage, perf_counter_ns() - self.start)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def timed(stage: str):
+    """
+    Context manager adding the time spent in its block to 'stage' of the
+    current request. Does nothing when the request isn't being timed.
+    """
+    timings = request_timings.get()
+    if timings is None:
+        return NULL_TIMER
+    return StageTimer(timings, stage)
+
+
+def start_timings() -> tuple:
+    """
+    Start timing the current request.
+    Returns:
+        (tuple): The timings and the token to reset request_timings with.
+    """
+    timings = RequestTimings()
+    return timings, request_timings.set(timings)